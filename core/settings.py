@@ -69,6 +69,93 @@ CELERY_WORKER_LOG_FORMAT = "%(asctime)s [%(levelname)s] %(message)s"
 CELERY_WORKER_TASK_LOG_FORMAT = "%(asctime)s [%(levelname)s] %(task_name)s[%(task_id)s]: %(message)s"
 CELERY_WORKER_REDIRECT_STDOUTS = True
 CELERY_WORKER_REDIRECT_STDOUTS_LEVEL = 'DEBUG'
+CELERY_BEAT_SCHEDULE = {
+    'compact-trending-scores': {
+        'task': 'ratings.tasks.compact_trending_scores',
+        'schedule': 60 * 60,
+    },
+    'reconcile-rating-histograms': {
+        'task': 'ratings.tasks.reconcile_rating_histograms',
+        'schedule': 60 * 60 * 24,
+    },
+    'build-content-neighbours': {
+        'task': 'recommendation.tasks.build_content_neighbours_task',
+        'schedule': 60 * 60 * 24,
+    },
+}
+
+
+# Recommendation model artifacts. Each trained model is published into its own version
+# directory here; workers re-check the active version every RECOMMENDATION_MODEL_CHECK_INTERVAL seconds.
+RECOMMENDATION_MODEL_DIR = env('RECOMMENDATION_MODEL_DIR', default=os.path.join(BASE_DIR, 'recommendation', 'models'))
+RECOMMENDATION_MODEL_CHECK_INTERVAL = env.int('RECOMMENDATION_MODEL_CHECK_INTERVAL', default=5)
+RECOMMENDATION_MODEL_KEEP_VERSIONS = 3
+# Nodes that do not share RECOMMENDATION_MODEL_DIR with the trainer run `manage.py sync_model --watch`,
+# which polls the manifest train_model writes to Django's storage every RECOMMENDATION_MODEL_SYNC_INTERVAL
+# seconds and installs new versions. The tuned SVD parameters (best_params.json) are only read by
+# train_model and stay local to the node that trains.
+RECOMMENDATION_MODEL_SYNC_INTERVAL = env.int('RECOMMENDATION_MODEL_SYNC_INTERVAL', default=30)
+RECOMMENDATION_RATINGS_CHUNK_SIZE = 10000  # rows fetched per round trip when reading ratings for training
+
+# Candidate retrieval for collaborative and hybrid recommendations: 'exact' scans every movie,
+# 'ann' only scores the candidates returned by the Annoy index published with the model.
+RECOMMENDATION_RETRIEVAL = env('RECOMMENDATION_RETRIEVAL', default='exact')
+RECOMMENDATION_ANN_TREES = 50
+RECOMMENDATION_ANN_SEARCH_K = -1
+RECOMMENDATION_ANN_OVERFETCH = 10  # candidates fetched per requested recommendation
+
+# Largest number of predictions accepted by the batch prediction endpoint
+RECOMMENDATION_MAX_BATCH_SIZE = 500
+
+# Hybrid ranking blends these signals, each scaled to [0, 1]; weights of signals that do not
+# apply to a user (no factors, no liked movies, no preferred genres) go to the others.
+RECOMMENDATION_HYBRID_WEIGHTS = {'svd': 0.6, 'content': 0.2, 'genre': 0.15, 'rating': 0.05}
+RECOMMENDATION_HYBRID_LIKED_SCORE = 7.0  # ratings at or above this count as liked for content similarity
+RECOMMENDATION_CATALOGUE_TTL = 300  # seconds before a worker rebuilds its in-memory catalogue
+
+# Users the model was not trained with reach the full SVD weight after this many ratings
+RECOMMENDATION_COLD_START_RATINGS = 5
+
+# Regularization used when folding users the model has not seen into the frozen item factors
+RECOMMENDATION_FOLD_IN_REG = 0.2
+
+# Per-user recommendation lists are cached until the user rates something or the model changes.
+# Set RECOMMENDATION_RECOMPUTE_ON_RATING to queue a Celery recompute after each rating write.
+RECOMMENDATION_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Ranked lists are computed once to this depth and served page by page through signed cursors.
+# Cursors page through a snapshot of the list, kept for RECOMMENDATION_LIST_SNAPSHOT_TIMEOUT seconds.
+RECOMMENDATION_LIST_DEPTH = 200
+RECOMMENDATION_LIST_SNAPSHOT_TIMEOUT = 60 * 30
+RECOMMENDATION_PAGE_SIZE = 10
+RECOMMENDATION_MAX_PAGE_SIZE = 50
+RECOMMENDATION_RECOMPUTE_ON_RATING = env.bool('RECOMMENDATION_RECOMPUTE_ON_RATING', default=False)
+
+# Concurrent cache misses for the same user share one computation: 'local' within a process,
+# 'cache' also across processes through a lock in the shared cache, 'off' to disable.
+RECOMMENDATION_SINGLE_FLIGHT = env('RECOMMENDATION_SINGLE_FLIGHT', default='local')
+RECOMMENDATION_SINGLE_FLIGHT_LOCK_TIMEOUT = 30  # seconds before a lock of a crashed computation expires
+RECOMMENDATION_SINGLE_FLIGHT_WAIT = 10  # seconds to wait for another process before computing anyway
+
+# Content-based similarity: TF-IDF of overviews plus a genre block, top-K neighbours per movie
+RECOMMENDATION_CONTENT_NEIGHBOURS = 20
+RECOMMENDATION_CONTENT_GENRE_WEIGHT = 0.5
+RECOMMENDATION_CONTENT_MAX_TERMS = 50000
+RECOMMENDATION_NEIGHBOUR_CHUNK_SIZE = 256  # rows per block when computing neighbours
+
+# "More like this": top-K cosine neighbours in SVD item-factor space, built with each model version
+RECOMMENDATION_ITEM_NEIGHBOURS = 20
+
+# Threads per process that run CPU-bound scoring for the async recommendation views
+RECOMMENDATION_SCORING_THREADS = env.int('RECOMMENDATION_SCORING_THREADS', default=4)
+
+# Trending: rating activity decayed exponentially with this half-life (seconds). Trends are
+# stored in a time-independent form, so changing the half-life requires `rebuild_trending`.
+TRENDING_HALF_LIFE = 60 * 60 * 24 * 3
+TRENDING_MIN_SCORE = 0.01  # movies whose decayed activity falls below this are compacted away
+
+# Most ratings accepted by one request to the batch rating endpoint
+RATING_BATCH_MAX_SIZE = 100
 
 
 # Application definition
@@ -142,6 +229,7 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'core.wsgi.application'
+ASGI_APPLICATION = 'core.asgi.application'
 
 LOGGING = {
     'version': 1,
@@ -186,6 +274,17 @@ DATABASES = {
 }
 
 
+# Cache
+# Use a shared backend such as redis://localhost:6380/1 in production so invalidations reach every worker.
+
+CACHES = {
+    'default': env.cache('CACHE_URL', default='locmemcache://'),
+}
+
+# Cached movie summaries ("cards") shared by list and recommendation responses
+MOVIE_CARD_CACHE_TIMEOUT = 60 * 60 * 24
+
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -0,0 +1,54 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Prefetch
+from django.urls import reverse
+
+from .models import Genre, Movie
+from .serializers import MovieCardSerializer
+
+
+def movie_card_key(movie_id):
+    return f"movie_card_{movie_id}"
+
+
+def get_movie_cards(movie_ids):
+    """
+    Returns the cards of `movie_ids` in the same order, skipping movies that do not exist.
+
+    A card is the movie summary shared by list and recommendation responses. All cards
+    are read with one `cache.get_many`; misses are filled with a single `id__in` query
+    (plus one prefetch for genres) and written back with `cache.set_many`.
+    """
+    movie_ids = list(movie_ids)
+    cached = cache.get_many([movie_card_key(movie_id) for movie_id in movie_ids])
+    cards = {movie_id: cached[movie_card_key(movie_id)] for movie_id in movie_ids if movie_card_key(movie_id) in cached}
+
+    missing = set(movie_ids) - cards.keys()
+    if missing:
+        movies = Movie.objects.filter(id__in=missing).prefetch_related(
+            Prefetch('genres', queryset=Genre.objects.order_by('id'))
+        )
+        fresh = {movie.id: dict(MovieCardSerializer(movie).data) for movie in movies}
+        cache.set_many(
+            {movie_card_key(movie_id): card for movie_id, card in fresh.items()},
+            timeout=settings.MOVIE_CARD_CACHE_TIMEOUT,
+        )
+        cards.update(fresh)
+
+    return [cards[movie_id] for movie_id in movie_ids if movie_id in cards]
+
+
+def invalidate_movie_cards(movie_ids):
+    cache.delete_many([movie_card_key(movie_id) for movie_id in movie_ids])
+
+
+def card_with_url(card, request):
+    """
+    Adds the absolute detail URL to a card, as `MovieMinimalSerializer` does.
+    """
+    url = None
+    if card['genres']:
+        url = request.build_absolute_uri(
+            reverse('movie-detail', kwargs={'genre_slug': card['genres'][0]['slug'], 'identifier': card['slug']})
+        )
+    return {**card, 'url': url}
@@ -0,0 +1,44 @@
+# Generated by Django 5.0.4 on 2024-08-25 09:41
+
+from django.db import migrations, models
+from django.db.models import Case, Count, F, FloatField, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Cast, Coalesce, Round
+
+
+def backfill_rating_totals(apps, schema_editor):
+    """
+    Sets the rating totals and average of every movie from its ratings, set-based.
+    """
+    Movie = apps.get_model('movies', 'Movie')
+    Rating = apps.get_model('ratings', 'Rating')
+    ratings = Rating.objects.filter(movie=OuterRef('pk')).order_by().values('movie')
+    Movie.objects.update(
+        rating_sum=Coalesce(Subquery(ratings.annotate(total=Sum('score')).values('total')), Value(0), output_field=models.DecimalField()),
+        rating_count=Coalesce(Subquery(ratings.annotate(count=Count('id')).values('count')), Value(0)),
+    )
+    Movie.objects.update(average_rating=Case(
+        When(rating_count__gt=0, then=Round(Cast(F('rating_sum'), FloatField()) / F('rating_count'), 2)),
+        default=Value(0.0),
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0003_movie_tmdb_id'),
+        ('ratings', '0003_movietrend'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='movie',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0, help_text='Number of ratings of the movie.'),
+        ),
+        migrations.AddField(
+            model_name='movie',
+            name='rating_sum',
+            field=models.DecimalField(decimal_places=1, default=0, help_text='Sum of all rating scores of the movie.', max_digits=12),
+        ),
+        migrations.RunPython(backfill_rating_totals, migrations.RunPython.noop),
+    ]
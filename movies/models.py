@@ -1,8 +1,9 @@
 from django.db import models
 from django.contrib.auth import get_user_model
 from django.utils.text import slugify
-from django.db.models import Avg
-from django.core.cache import cache
+from decimal import Decimal
+from django.db.models import Avg, Case, Count, F, FloatField, Sum, Value, When
+from django.db.models.functions import Cast, Round
 
 User = get_user_model()
 
@@ -32,20 +33,57 @@ class Movie(models.Model):
     trailer_url = models.URLField(blank=True, null=True, help_text="URL to the movie's trailer.")
     genres = models.ManyToManyField(Genre, related_name='movies', help_text="Genres associated with this movie.")
     average_rating = models.DecimalField(max_digits=4, decimal_places=2, default=0.0, db_index=True, help_text="Calculated average rating based on user reviews.")
+    rating_sum = models.DecimalField(max_digits=12, decimal_places=1, default=0, help_text="Sum of all rating scores of the movie.")
+    rating_count = models.PositiveIntegerField(default=0, help_text="Number of ratings of the movie.")
+
+    # Maintained in the database by atomic updates; see `adjust_rating_totals`
+    RATING_FIELDS = ('average_rating', 'rating_sum', 'rating_count')
 
     def save(self, *args, **kwargs):
         if not self.slug or self.slug != slugify(self.title):
             self.slug = slugify(self.title)
+        if not self._state.adding and kwargs.get('update_fields') is None and not kwargs.get('force_insert'):
+            # Never write back rating totals loaded before a concurrent rating changed them
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.RATING_FIELDS
+            ]
         super().save(*args, **kwargs)
 
+    @classmethod
+    def adjust_rating_totals(cls, movie_id, count=0, total=0):
+        """
+        Adds `count` ratings with scores summing to `total` (both may be negative) to a
+        movie's totals and derives the new average, in one atomic UPDATE with F()
+        expressions, so concurrent raters never overwrite each other's changes.
+        """
+        new_sum = F('rating_sum') + Value(Decimal(str(total)))
+        new_count = F('rating_count') + count
+        cls.objects.filter(pk=movie_id).update(
+            # Listed first, as MySQL evaluates assignments left to right using the new values
+            average_rating=Case(
+                When(rating_count__gt=-count, then=Round(Cast(new_sum, FloatField()) / new_count, 2)),
+                default=Value(0.0),
+            ),
+            rating_sum=new_sum,
+            rating_count=new_count,
+        )
+
     def update_average_rating(self):
-        cache_key = f"{self.pk}_average_rating"
-        average = cache.get(cache_key)
-        if average is None:
-            average = self.ratings.aggregate(average_score=Avg('score'))['average_score'] or 0.00
-            cache.set(cache_key, average, timeout=3600)  # Cache for 1 hour
-        self.average_rating = average
-        self.save(update_fields=['average_rating'])
+        """
+        Recomputes the rating totals and average from all of the movie's ratings, e.g. to
+        repair them after ratings were written without signals.
+        """
+        # Rounded by the database, like the incremental updates, so both agree on halves
+        totals = self.ratings.aggregate(
+            rating_sum=Sum('score'),
+            rating_count=Count('id'),
+            average_rating=Round(Avg('score', output_field=FloatField()), 2),
+        )
+        self.rating_sum = totals['rating_sum'] or 0
+        self.rating_count = totals['rating_count']
+        self.average_rating = Decimal(str(totals['average_rating'])) if self.rating_count else 0
+        self.save(update_fields=['rating_sum', 'rating_count', 'average_rating'])
 
     def __str__(self):
         return f"{self.title} ({self.release_date.year if self.release_date else 'Unknown Year'})"
@@ -2,6 +2,7 @@ from rest_framework import serializers
 from rest_framework.pagination import PageNumberPagination
 from .models import Movie, Genre, Comment, Watchlist
 from django.urls import reverse
+from ratings.histogram import movie_histogram
 
 class GenreMinimalSerializer(serializers.ModelSerializer):
     class Meta:
@@ -24,6 +25,18 @@ class MovieMinimalSerializer(serializers.ModelSerializer):
             return request.build_absolute_uri(url) 
 
 
+class MovieCardSerializer(serializers.ModelSerializer):
+    """
+    Request-independent movie summary cached per movie; see `movies.cache`.
+    Together with `card_with_url` it renders the same fields as `MovieMinimalSerializer`.
+    """
+    genres = GenreMinimalSerializer(many=True, read_only=True)
+
+    class Meta:
+        model = Movie
+        fields = ['id', 'slug', 'title', 'overview', 'language', 'release_date', 'poster_url', 'trailer_url', 'genres', 'average_rating']
+
+
 class PaginatedMovieSerializer(serializers.Serializer):
     """
     Serializer for paginating movies.
@@ -84,14 +97,22 @@ class MovieSerializer(serializers.ModelSerializer):
     genres = GenreMinimalSerializer(many=True, read_only=True)
     comments = CommentSerializer(many=True, read_only=True)
     average_rating = serializers.DecimalField(max_digits=4, decimal_places=2, read_only=True)
+    rating_histogram = serializers.SerializerMethodField()
 
     class Meta:
         model = Movie
         fields = [
             'id', 'slug', 'title', 'overview', 'release_date', 'cast',
             'language', 'poster_url', 'trailer_url', 'genres',
-            'average_rating', 'comments'
+            'average_rating', 'rating_count', 'rating_histogram', 'comments'
         ]
+        read_only_fields = ['rating_count']
+
+    def get_rating_histogram(self, obj):
+        """
+        Number of ratings per score bucket 1-10, read from the precomputed histogram.
+        """
+        return movie_histogram(obj)
 
     def get_comments(self, obj):
         """
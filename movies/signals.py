@@ -0,0 +1,38 @@
+from django.db.models.signals import post_save, post_delete, pre_delete, m2m_changed
+from django.dispatch import receiver
+from .cache import invalidate_movie_cards
+from .models import Movie, Genre
+
+
+@receiver(post_save, sender=Movie)
+@receiver(post_delete, sender=Movie)
+def invalidate_card_on_movie_change(sender, instance, **kwargs):
+    """
+    Drop the cached card of a movie whenever it is saved or deleted.
+    """
+    invalidate_movie_cards([instance.pk])
+
+
+@receiver(m2m_changed, sender=Movie.genres.through)
+def invalidate_cards_on_genres_change(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Drop the cached cards of movies whose genres were added, removed or cleared.
+    """
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            invalidate_movie_cards([instance.pk])
+    elif action in ('post_add', 'post_remove'):
+        invalidate_movie_cards(pk_set)
+    elif action == 'pre_clear':
+        # The genre's movies are no longer known once the clear has run
+        invalidate_movie_cards(instance.movies.values_list('id', flat=True))
+
+
+@receiver(post_save, sender=Genre)
+@receiver(pre_delete, sender=Genre)
+def invalidate_cards_on_genre_change(sender, instance, **kwargs):
+    """
+    Drop the cached cards of every movie in a genre when the genre is renamed or deleted.
+    """
+    if instance.pk:
+        invalidate_movie_cards(instance.movies.values_list('id', flat=True))
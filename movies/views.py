@@ -10,11 +10,11 @@ from rest_framework.exceptions import PermissionDenied, NotFound, ValidationErro
 from .models import Movie, Genre, Comment, Watchlist
 from .serializers import MovieSerializer, GenreSerializer, CommentSerializer, MovieMinimalSerializer, GenreMinimalSerializer, WatchlistSerializer
 from rest_framework.pagination import PageNumberPagination
-from django.core.cache import cache
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
 from django.shortcuts import get_object_or_404
 from . utils import get_object_by_id_or_slug
+from .cache import get_movie_cards, card_with_url
 
 
 
@@ -346,18 +346,19 @@ class GenreMoviesListView(generics.ListAPIView):
     def get_queryset(self):
         """
         Fetches movies that belong to a specific genre identified by 'genre_slug'.
-        Caches the genre object and its movies if not already cached.
         """
-        cache_key = f"genre_movies_{self.kwargs['genre_slug']}"
-        cached_genre_movies = cache.get(cache_key)
-
-        if cached_genre_movies:
-            return cached_genre_movies
-
         genre = get_object_or_404(Genre, slug=self.kwargs['genre_slug'])
-        movies = genre.movies.all().prefetch_related('genres')
-        cache.set(cache_key, movies, timeout=3600)  # Cache for 1 hour
-        return movies
+        return genre.movies.all()
+
+    def list(self, request, *args, **kwargs):
+        """
+        Filters and paginates movie ids only, then renders the page from the cached movie cards.
+        """
+        movie_ids = self.filter_queryset(self.get_queryset()).values_list('id', flat=True)
+        page = self.paginate_queryset(movie_ids)
+        if page is not None:
+            return self.get_paginated_response([card_with_url(card, request) for card in get_movie_cards(page)])
+        return Response([card_with_url(card, request) for card in get_movie_cards(movie_ids)])
 
     
 
@@ -881,8 +882,8 @@ class TopRatedMoviesView(APIView):
             # If the conversion fails, return an error response
             return Response({"error": "Invalid threshold value."}, status=400)
 
-        # Query the movies that have an average rating greater or equal to the threshold
-        queryset = Movie.objects.filter(average_rating__gte=threshold)
+        # Query the ids of movies that have an average rating greater or equal to the threshold
+        queryset = Movie.objects.filter(average_rating__gte=threshold).values_list('id', flat=True)
 
         # Initialize the paginator
         paginator = PageNumberPagination()
@@ -891,15 +892,15 @@ class TopRatedMoviesView(APIView):
         # Paginate the queryset
         page = paginator.paginate_queryset(queryset, request)
         if page is not None:
-            # If pagination is successful, serialize the page of movies
-            serializer = MovieMinimalSerializer(page, many=True, context={'request': request})
+            # If pagination is successful, render the page of movies from the cached movie cards
+            data = [card_with_url(card, request) for card in get_movie_cards(page)]
             # Return the paginated response
-            return paginator.get_paginated_response(serializer.data)
+            return paginator.get_paginated_response(data)
 
         # If no pagination is required (unlikely unless page size is larger than the queryset),
-        # serialize and return the entire queryset
-        serializer = MovieMinimalSerializer(queryset, many=True, context={'request': request})
-        return Response(serializer.data)
+        # render the entire queryset
+        data = [card_with_url(card, request) for card in get_movie_cards(queryset)]
+        return Response(data)
     
 
 class WatchlistCreateView(APIView):
@@ -0,0 +1,257 @@
+import contextvars
+import logging
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from decimal import Decimal
+from functools import reduce
+from operator import or_
+
+from django.db import connections, router, transaction
+from django.db.models import Avg, Count, DecimalField, FloatField, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Round
+
+from movies.cache import invalidate_movie_cards
+from recommendation.cache import invalidate_many_user_recommendations
+from .histogram import adjust_bucket, rebuild_histograms, score_bucket
+from .models import Movie, Rating
+from .trending import forget_rating, record_ratings
+
+logger = logging.getLogger(__name__)
+
+# Movies per UPDATE when recomputing totals, keeping the IN list within database limits
+RECOMPUTE_CHUNK_SIZE = 500
+
+# (user, movie) pairs per lookup when saving ratings, keeping the OR'ed conditions short
+PAIR_CHUNK_SIZE = 200
+
+_current_batch = contextvars.ContextVar('bulk_rating_batch', default=None)
+
+
+class BulkRatingBatch:
+    """
+    Rating writes collected inside `bulk_ratings`, applied together when it exits.
+
+    With `recompute` the affected movies' totals and histograms are recomputed from
+    their ratings, which suits bulk loads touching many ratings per movie. Otherwise the
+    net change of each movie is applied as a delta, which costs the same however many
+    ratings the movie has; movies with a change whose previous score is unknown are
+    recomputed either way.
+    """
+
+    def __init__(self, recompute=True):
+        self.recompute = recompute
+        self.movie_ids = set()
+        self.stale_movie_ids = set()
+        self.user_ids = set()
+        self.totals = defaultdict(lambda: [0, Decimal(0)])  # movie_id -> [count, total]
+        self.buckets = Counter()  # (movie_id, bucket) -> count
+        self.created_ratings = []
+        self.deleted_ratings = []
+
+    def _add(self, movie_id, score, sign):
+        totals = self.totals[movie_id]
+        totals[0] += sign
+        totals[1] += sign * Decimal(str(score))
+        self.buckets[movie_id, score_bucket(score)] += sign
+        self.movie_ids.add(movie_id)
+
+    def created(self, ratings):
+        """
+        Registers newly inserted ratings, e.g. after a `bulk_create`, which sends no signals.
+        """
+        for rating in ratings:
+            self._add(rating.movie_id, rating.score, 1)
+            self.user_ids.add(rating.user_id)
+            self.created_ratings.append((rating.movie_id, rating.created_at))
+
+    def changed(self, rating, old_movie_id, old_score):
+        """
+        Registers an updated rating with the movie and score it had before. If they are
+        unknown (None), the movies it affects are recomputed.
+        """
+        self.user_ids.add(rating.user_id)
+        if old_movie_id is None or old_score is None:
+            self.movie_ids.add(rating.movie_id)
+            self.stale_movie_ids.update(movie_id for movie_id in (old_movie_id, rating.movie_id) if movie_id is not None)
+            return
+        self._add(old_movie_id, old_score, -1)
+        self._add(rating.movie_id, rating.score, 1)
+
+    def deleted(self, rating):
+        movie_id, score = getattr(rating, '_stored_rating', (None, None))
+        if movie_id is None or score is None:
+            movie_id, score = rating.movie_id, rating.score
+        self._add(movie_id, score, -1)
+        self.user_ids.add(rating.user_id)
+        self.deleted_ratings.append(rating)
+
+    def apply_totals(self):
+        """
+        Updates the totals and histograms of the movies changed since the last call. In
+        delta mode `save_ratings` calls this inside the transaction that wrote the ratings,
+        so the totals commit together with them; recomputes are left to `apply`.
+        """
+        if self.recompute:
+            return
+        self._update_totals(self.stale_movie_ids)
+
+    def _update_totals(self, stale):
+        movie_ids = sorted(stale)
+        recompute_rating_totals(movie_ids)
+        rebuild_histograms(movie_ids)
+        for movie_id, (count, total) in sorted(self.totals.items()):
+            if movie_id not in stale and (count or total):
+                Movie.adjust_rating_totals(movie_id, count=count, total=total)
+        for (movie_id, bucket), delta in sorted(self.buckets.items()):
+            if movie_id not in stale and delta:
+                adjust_bucket(movie_id, bucket, delta)
+        self.totals.clear()
+        self.buckets.clear()
+        self.stale_movie_ids.clear()
+
+    def apply(self):
+        """
+        Updates the totals and histograms of every affected movie and replays the cache
+        and trending work the per-row signals would have done.
+        """
+        self._update_totals(self.movie_ids if self.recompute else self.stale_movie_ids)
+        invalidate_movie_cards(sorted(self.movie_ids))
+        if self.created_ratings:
+            record_ratings(*zip(*self.created_ratings))
+        for rating in self.deleted_ratings:
+            forget_rating(rating)
+        invalidate_many_user_recommendations(self.user_ids)
+
+
+def current_batch():
+    """
+    Returns the batch of the enclosing `bulk_ratings` block, or None outside of one.
+    """
+    return _current_batch.get()
+
+
+@contextmanager
+def bulk_ratings(recompute=True):
+    """
+    Defers the per-row work of rating writes.
+
+    Inside the block the rating signals only record which movies and users were touched
+    and how. On exit the affected movies' totals, averages and histograms are updated,
+    and caches and trending scores are updated once. By default the totals are
+    recomputed from the movies' ratings in one UPDATE per chunk of movies and the
+    histograms rebuilt, as suits bulk loads; with `recompute=False` only the net change
+    of each movie is applied, as suits request-sized batches. Rows written with
+    `bulk_create` must be registered with `batch.created(rows)` or
+    `batch.changed(row, old_movie_id, old_score)`. Nested blocks join the outermost one.
+    """
+    batch = _current_batch.get()
+    if batch is not None:
+        yield batch
+        return
+
+    batch = BulkRatingBatch(recompute=recompute)
+    token = _current_batch.set(batch)
+    try:
+        yield batch
+    except BaseException:
+        _current_batch.reset(token)
+        # Rows written before the error may have been committed, so the touched movies are
+        # recounted from their ratings (deltas may include rolled back writes), unless the
+        # enclosing transaction is being rolled back anyway. The original error is kept.
+        if not transaction.get_connection().needs_rollback:
+            batch.recompute = True
+            try:
+                with transaction.atomic():
+                    batch.apply()
+            except Exception:
+                logger.exception('Could not update the rating totals of %s movies after a failed batch', len(batch.movie_ids))
+        raise
+    else:
+        _current_batch.reset(token)
+        if not transaction.get_connection().needs_rollback:
+            batch.apply()
+
+
+def recompute_rating_totals(movie_ids):
+    """
+    Sets the rating totals and average of `movie_ids` from their ratings, with one
+    set-based UPDATE per chunk: every movie is assigned the grouped aggregates of its
+    own ratings through correlated subqueries.
+    """
+    ratings = Rating.objects.filter(movie=OuterRef('pk')).order_by().values('movie')
+    for start in range(0, len(movie_ids), RECOMPUTE_CHUNK_SIZE):
+        Movie.objects.filter(id__in=movie_ids[start:start + RECOMPUTE_CHUNK_SIZE]).update(
+            average_rating=Coalesce(
+                Subquery(ratings.annotate(average=Round(Avg('score', output_field=FloatField()), 2)).values('average')),
+                Value(0.0),
+            ),
+            rating_sum=Coalesce(
+                Subquery(ratings.annotate(total=Sum('score')).values('total')), Value(0), output_field=DecimalField(),
+            ),
+            rating_count=Coalesce(Subquery(ratings.annotate(count=Count('id')).values('count')), Value(0)),
+        )
+
+
+def upsert_ratings(ratings):
+    """
+    Inserts `ratings`, updating the score of any (user, movie) pair that was already
+    rated, in one INSERT ... ON CONFLICT statement per batch. Returns the ratings.
+    The rows send no signals; call it inside `bulk_ratings` and register them there.
+    """
+    connection = connections[router.db_for_write(Rating)]
+    # MySQL resolves conflicts on any unique key and does not accept a conflict target
+    unique_fields = ['user', 'movie'] if connection.features.supports_update_conflicts_with_target else None
+    return Rating.objects.bulk_create(
+        ratings, update_conflicts=True, unique_fields=unique_fields, update_fields=['score', 'updated_at'],
+    )
+
+
+def _pairs_filter(pairs):
+    """
+    Q matching exactly the ratings of the (user_id, movie_id) `pairs`.
+    """
+    return reduce(or_, (Q(user_id=user_id, movie_id=movie_id) for user_id, movie_id in pairs))
+
+
+def save_ratings(ratings, batch):
+    """
+    Upserts `ratings` and registers them with `batch`: pairs that were not rated yet as
+    created and the others as changed from their previous score, so re-rating a movie
+    is not counted as new trending activity. Returns the (created, updated) ratings.
+
+    The rated movies' rows are locked first, so concurrent batches rating the same
+    movies take turns, then the existing ratings of exactly the written pairs. A pair
+    that another writer inserted in between is recognised by its creation time and
+    its movie recomputed. In delta mode the totals are updated in the same transaction.
+    """
+    ratings = list(ratings)
+    pairs = sorted({(rating.user_id, rating.movie_id) for rating in ratings})
+    with transaction.atomic(using=router.db_for_write(Rating)):
+        movies = Movie.objects.select_for_update().filter(id__in={movie_id for _, movie_id in pairs})
+        list(movies.order_by('id').values_list('id'))
+        previous = {}
+        for start in range(0, len(pairs), PAIR_CHUNK_SIZE):
+            rows = Rating.objects.select_for_update().filter(_pairs_filter(pairs[start:start + PAIR_CHUNK_SIZE]))
+            for user_id, movie_id, score in rows.values_list('user_id', 'movie_id', 'score'):
+                previous[user_id, movie_id] = score
+        ratings = upsert_ratings(ratings)
+
+        new = [rating for rating in ratings if (rating.user_id, rating.movie_id) not in previous]
+        created_ats = {}
+        new_pairs = [(rating.user_id, rating.movie_id) for rating in new]
+        for start in range(0, len(new_pairs), PAIR_CHUNK_SIZE):
+            rows = Rating.objects.filter(_pairs_filter(new_pairs[start:start + PAIR_CHUNK_SIZE]))
+            for user_id, movie_id, created_at in rows.values_list('user_id', 'movie_id', 'created_at'):
+                created_ats[user_id, movie_id] = created_at
+
+        created = [rating for rating in new if created_ats.get((rating.user_id, rating.movie_id)) == rating.created_at]
+        updated = [rating for rating in ratings if (rating.user_id, rating.movie_id) in previous]
+        # Inserted by another writer after the lookup; the score it replaced is unknown
+        raced = [rating for rating in new if created_ats.get((rating.user_id, rating.movie_id)) != rating.created_at]
+        batch.created(created)
+        for rating in updated:
+            batch.changed(rating, rating.movie_id, previous[rating.user_id, rating.movie_id])
+        for rating in raced:
+            batch.changed(rating, None, None)
+        batch.apply_totals()
+    return created, updated + raced
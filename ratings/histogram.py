@@ -0,0 +1,95 @@
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, IntegerField, Value
+from django.db.models.functions import Cast, Floor, Greatest, Least
+
+from .models import MovieRatingBucket, Rating
+
+BUCKETS = range(1, 11)
+
+# Movies per chunk when rebuilding histograms
+REBUILD_CHUNK_SIZE = 500
+
+
+def score_bucket(score):
+    """
+    Histogram bucket of a score: the score rounded half up and clamped to 1-10.
+    """
+    bucket = int(Decimal(str(score)).quantize(Decimal('1'), rounding=ROUND_HALF_UP))
+    return min(max(bucket, BUCKETS[0]), BUCKETS[-1])
+
+
+def bucket_expression():
+    """
+    `score_bucket` of the `score` column as a database expression.
+    """
+    return Cast(Least(Greatest(Floor(F('score') + Value(Decimal('0.5'))), Value(1)), Value(10)), IntegerField())
+
+
+def adjust_bucket(movie_id, bucket, delta):
+    """
+    Adds `delta` to one bucket of a movie's histogram with an atomic F() update,
+    creating the bucket on its first rating.
+    """
+    buckets = MovieRatingBucket.objects.filter(movie_id=movie_id, bucket=bucket)
+    if delta < 0:
+        # Never below zero; a histogram that drifted is fixed by the next reconciliation
+        buckets = buckets.filter(count__gte=-delta)
+    if buckets.update(count=F('count') + delta) or delta < 0:
+        return
+    try:
+        with transaction.atomic():
+            MovieRatingBucket.objects.create(movie_id=movie_id, bucket=bucket, count=delta)
+    except IntegrityError:
+        # Another rating created the bucket concurrently
+        MovieRatingBucket.objects.filter(movie_id=movie_id, bucket=bucket).update(count=F('count') + delta)
+
+
+def move_rating(old_movie_id, old_score, movie_id, score):
+    """
+    Moves a rating between buckets after its score or movie changed; either side may be
+    None for a created or deleted rating.
+    """
+    old = (old_movie_id, score_bucket(old_score)) if old_movie_id is not None else None
+    new = (movie_id, score_bucket(score)) if movie_id is not None else None
+    if old == new:
+        return
+    if old is not None:
+        adjust_bucket(*old, -1)
+    if new is not None:
+        adjust_bucket(*new, 1)
+
+
+def movie_histogram(movie):
+    """
+    Returns {'1': count, ..., '10': count} for a movie from its precomputed buckets.
+    """
+    counts = dict(movie.rating_buckets.values_list('bucket', 'count'))
+    return {str(bucket): counts.get(bucket, 0) for bucket in BUCKETS}
+
+
+def rebuild_histograms(movie_ids=None):
+    """
+    Rebuilds the histograms of `movie_ids` (all movies if None) from their ratings with
+    one grouped query per chunk of movies. Returns the number of buckets written.
+    """
+    if movie_ids is None:
+        movie_ids = list(Rating.objects.order_by('movie_id').values_list('movie_id', flat=True).distinct())
+        with transaction.atomic():
+            MovieRatingBucket.objects.exclude(movie_id__in=Rating.objects.values('movie_id')).delete()
+    movie_ids = sorted(movie_ids)
+
+    written = 0
+    for start in range(0, len(movie_ids), REBUILD_CHUNK_SIZE):
+        chunk = movie_ids[start:start + REBUILD_CHUNK_SIZE]
+        counts = (
+            Rating.objects.filter(movie_id__in=chunk).order_by()
+            .annotate(bucket=bucket_expression()).values('movie_id', 'bucket').annotate(count=Count('id'))
+        )
+        buckets = [MovieRatingBucket(movie_id=row['movie_id'], bucket=row['bucket'], count=row['count']) for row in counts]
+        with transaction.atomic():
+            MovieRatingBucket.objects.filter(movie_id__in=chunk).delete()
+            MovieRatingBucket.objects.bulk_create(buckets)
+        written += len(buckets)
+    return written
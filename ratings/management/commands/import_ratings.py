@@ -6,6 +6,7 @@ from django.db.utils import IntegrityError
 from django.contrib.auth import get_user_model
 from movies.models import Movie  
 from ratings.models import Rating  
+from ratings.bulk import bulk_ratings
 from datetime import datetime
 from faker import Faker
 from django.conf import settings
@@ -23,29 +24,31 @@ class Command(BaseCommand):
 
         with open(file_path, newline='', encoding='utf-8') as csvfile:
             reader = csv.DictReader(csvfile)
-            for row in reader:
-                with transaction.atomic():
-                    user_id = int(row['userId'])
-                    movie_id = int(row['movieId'])
-                    score = float(row['rating'])
-                    timestamp = datetime.fromtimestamp(float(row['timestamp']))
-
-                    user = self.get_or_create_user(user_id)
-                    if user is None:
-                        self.stdout.write(self.style.ERROR('Maximum retry limit reached for user creation. Skipping row.'))
-                        continue
-
-                    try:
-                        movie = Movie.objects.get(id=movie_id)
-                        rating, created = Rating.objects.update_or_create(
-                            user=user,
-                            movie=movie,
-                            defaults={'score': score, 'created_at': timestamp, 'updated_at': timestamp}
-                        )
-                        action = "added" if created else "updated"
-                        self.stdout.write(self.style.SUCCESS(f'Rating for {movie.title} by {user.email} {action}.'))
-                    except Movie.DoesNotExist:
-                        self.stdout.write(self.style.WARNING(f'Skipped rating for movie ID {movie_id} as it does not exist.'))
+            # Movie aggregates are recomputed once at the end instead of on every row
+            with bulk_ratings():
+                for row in reader:
+                    with transaction.atomic():
+                        user_id = int(row['userId'])
+                        movie_id = int(row['movieId'])
+                        score = float(row['rating'])
+                        timestamp = datetime.fromtimestamp(float(row['timestamp']))
+
+                        user = self.get_or_create_user(user_id)
+                        if user is None:
+                            self.stdout.write(self.style.ERROR('Maximum retry limit reached for user creation. Skipping row.'))
+                            continue
+
+                        try:
+                            movie = Movie.objects.get(id=movie_id)
+                            rating, created = Rating.objects.update_or_create(
+                                user=user,
+                                movie=movie,
+                                defaults={'score': score, 'created_at': timestamp, 'updated_at': timestamp}
+                            )
+                            action = "added" if created else "updated"
+                            self.stdout.write(self.style.SUCCESS(f'Rating for {movie.title} by {user.email} {action}.'))
+                        except Movie.DoesNotExist:
+                            self.stdout.write(self.style.WARNING(f'Skipped rating for movie ID {movie_id} as it does not exist.'))
 
     def get_or_create_user(self, user_id, retry=0):
         if retry > 3:  # Set a max retry limit to prevent infinite recursion
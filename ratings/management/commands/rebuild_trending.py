@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from ratings.trending import rebuild_trending
+
+
+class Command(BaseCommand):
+    help = 'Recomputes the trending scores of all movies from recent ratings'
+
+    def handle(self, *args, **options):
+        count = rebuild_trending()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt trending scores for {count} movies."))
@@ -0,0 +1,23 @@
+# Generated by Django 5.0.4 on 2024-08-24 10:12
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0003_movie_tmdb_id'),
+        ('ratings', '0002_alter_rating_score'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MovieTrend',
+            fields=[
+                ('movie', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='trend', serialize=False, to='movies.movie')),
+                ('key', models.FloatField(db_index=True, help_text='Log-space trending key; higher means trending more right now.')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
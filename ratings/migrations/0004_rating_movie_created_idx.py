@@ -0,0 +1,17 @@
+# Generated by Django 5.0.4 on 2024-08-26 14:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ratings', '0003_movietrend'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='rating',
+            index=models.Index(fields=['movie', '-created_at', '-id'], name='rating_movie_created_idx'),
+        ),
+    ]
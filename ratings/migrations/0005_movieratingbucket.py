@@ -0,0 +1,45 @@
+# Generated by Django 5.0.4 on 2024-08-27 11:18
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import Count, F, IntegerField, Value
+from django.db.models.functions import Cast, Floor, Greatest, Least
+
+
+def backfill_histograms(apps, schema_editor):
+    """
+    Builds the histogram of every movie from its ratings with one grouped query.
+    """
+    Rating = apps.get_model('ratings', 'Rating')
+    MovieRatingBucket = apps.get_model('ratings', 'MovieRatingBucket')
+    bucket = Cast(Least(Greatest(Floor(F('score') + Value(Decimal('0.5'))), Value(1)), Value(10)), IntegerField())
+    counts = Rating.objects.order_by().annotate(bucket=bucket).values('movie_id', 'bucket').annotate(count=Count('id'))
+    MovieRatingBucket.objects.bulk_create(
+        (MovieRatingBucket(movie_id=row['movie_id'], bucket=row['bucket'], count=row['count']) for row in counts.iterator()),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0004_movie_rating_totals'),
+        ('ratings', '0004_rating_movie_created_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MovieRatingBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket', models.PositiveSmallIntegerField(help_text='Score bucket from 1 to 10.')),
+                ('count', models.PositiveIntegerField(default=0, help_text='Number of ratings in the bucket.')),
+                ('movie', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rating_buckets', to='movies.movie')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('movie', 'bucket'), name='unique_movie_rating_bucket')],
+            },
+        ),
+        migrations.RunPython(backfill_histograms, migrations.RunPython.noop),
+    ]
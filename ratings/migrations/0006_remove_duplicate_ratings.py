@@ -0,0 +1,54 @@
+# Generated by Django 5.0.4 on 2024-08-28 16:52
+
+from decimal import Decimal
+from django.db import migrations
+from django.db.models import Avg, Count, DecimalField, F, FloatField, IntegerField, Max, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Cast, Coalesce, Floor, Greatest, Least, Round
+
+
+def remove_duplicate_ratings(apps, schema_editor):
+    """
+    Keeps only the latest rating of each (user, movie) pair, then recomputes the totals
+    and histograms of the movies that lost ratings. The older ratings are deleted for
+    good, so the migration cannot be reversed.
+    """
+    Movie = apps.get_model('movies', 'Movie')
+    Rating = apps.get_model('ratings', 'Rating')
+    MovieRatingBucket = apps.get_model('ratings', 'MovieRatingBucket')
+
+    duplicates = Rating.objects.order_by().values('user_id', 'movie_id').annotate(latest=Max('id'), n=Count('id')).filter(n__gt=1)
+    movie_ids = set()
+    for pair in duplicates.iterator():
+        Rating.objects.filter(user_id=pair['user_id'], movie_id=pair['movie_id'], id__lt=pair['latest']).delete()
+        movie_ids.add(pair['movie_id'])
+    if not movie_ids:
+        return
+
+    ratings = Rating.objects.filter(movie=OuterRef('pk')).order_by().values('movie')
+    Movie.objects.filter(id__in=movie_ids).update(
+        average_rating=Coalesce(
+            Subquery(ratings.annotate(average=Round(Avg('score', output_field=FloatField()), 2)).values('average')),
+            Value(0.0),
+        ),
+        rating_sum=Coalesce(Subquery(ratings.annotate(total=Sum('score')).values('total')), Value(0), output_field=DecimalField()),
+        rating_count=Coalesce(Subquery(ratings.annotate(count=Count('id')).values('count')), Value(0)),
+    )
+
+    bucket = Cast(Least(Greatest(Floor(F('score') + Value(Decimal('0.5'))), Value(1)), Value(10)), IntegerField())
+    counts = Rating.objects.filter(movie_id__in=movie_ids).order_by().annotate(bucket=bucket).values('movie_id', 'bucket').annotate(count=Count('id'))
+    MovieRatingBucket.objects.filter(movie_id__in=movie_ids).delete()
+    MovieRatingBucket.objects.bulk_create(
+        MovieRatingBucket(movie_id=row['movie_id'], bucket=row['bucket'], count=row['count']) for row in counts
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0004_movie_rating_totals'),
+        ('ratings', '0005_movieratingbucket'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_ratings),
+    ]
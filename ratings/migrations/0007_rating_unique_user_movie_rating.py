@@ -0,0 +1,17 @@
+# Generated by Django 5.0.4 on 2024-08-28 16:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ratings', '0006_remove_duplicate_ratings'),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='rating',
+            constraint=models.UniqueConstraint(fields=('user', 'movie'), name='unique_user_movie_rating'),
+        ),
+    ]
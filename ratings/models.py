@@ -12,5 +12,55 @@ class Rating(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'movie'], name='unique_user_movie_rating')
+        ]
+        indexes = [
+            # Newest-first keyset pagination of a movie's ratings
+            models.Index(fields=['movie', '-created_at', '-id'], name='rating_movie_created_idx'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Snapshot of the stored movie and score, so the signals can apply the change as a delta
+        instance._stored_rating = (instance.__dict__.get('movie_id'), instance.__dict__.get('score'))
+        return instance
+
     def __str__(self):
         return f"{self.score}/10 by {self.user.email} for {self.movie.title}"
+
+
+class MovieTrend(models.Model):
+    """
+    Time-decayed rating activity of a movie, maintained incrementally as ratings arrive.
+
+    `key` is the log of the sum of exp(decay_rate * t) over the movie's rating times, so the
+    trending score at time `now` is exp(key - decay_rate * now) and ordering by `key` orders
+    movies by their current score without ever rewriting old rows. See `ratings.trending`.
+    """
+    movie = models.OneToOneField(Movie, on_delete=models.CASCADE, primary_key=True, related_name='trend')
+    key = models.FloatField(db_index=True, help_text="Log-space trending key; higher means trending more right now.")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Trend of {self.movie_id}: {self.key:.4f}"
+
+
+class MovieRatingBucket(models.Model):
+    """
+    One bar of a movie's rating histogram: the number of its ratings whose score rounds
+    to `bucket` (1-10). Maintained by the rating write path; see `ratings.histogram`.
+    """
+    movie = models.ForeignKey(Movie, on_delete=models.CASCADE, related_name='rating_buckets')
+    bucket = models.PositiveSmallIntegerField(help_text="Score bucket from 1 to 10.")
+    count = models.PositiveIntegerField(default=0, help_text="Number of ratings in the bucket.")
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['movie', 'bucket'], name='unique_movie_rating_bucket')
+        ]
+
+    def __str__(self):
+        return f"{self.count} ratings of {self.movie_id} in bucket {self.bucket}"
@@ -1,3 +1,5 @@
+from decimal import Decimal
+from django.conf import settings
 from rest_framework import serializers
 from .models import Rating
 
@@ -16,4 +18,38 @@ class RatingSerializer(serializers.ModelSerializer):
         """
         if not (1 <= value <= 10):
             raise serializers.ValidationError("The score must be between 1 and 10.")
-        return value
\ No newline at end of file
+        return value
+
+
+class RatingCompactSerializer(serializers.Serializer):
+    """
+    Compact rating rows for listings of one movie, read from a `values()` projection
+    without loading users or movies.
+    """
+    id = serializers.IntegerField()
+    user_id = serializers.IntegerField()
+    score = serializers.DecimalField(max_digits=3, decimal_places=1)
+    created_at = serializers.DateTimeField()
+
+
+class RatingBatchItemSerializer(serializers.Serializer):
+    movie_id = serializers.IntegerField()
+    score = serializers.DecimalField(max_digits=3, decimal_places=1, min_value=Decimal('1.0'), max_value=Decimal('10.0'))
+
+
+class RatingBatchSerializer(serializers.Serializer):
+    """
+    Accepts {"ratings": [{"movie_id": 1, "score": 7.5}, ...]} with each movie at most once.
+    """
+    ratings = RatingBatchItemSerializer(many=True)
+
+    def validate_ratings(self, value):
+        if not value:
+            raise serializers.ValidationError('At least one rating is required.')
+        max_size = settings.RATING_BATCH_MAX_SIZE
+        if len(value) > max_size:
+            raise serializers.ValidationError(f'At most {max_size} ratings can be submitted at once.')
+        movie_ids = [item['movie_id'] for item in value]
+        if len(set(movie_ids)) != len(movie_ids):
+            raise serializers.ValidationError('Each movie can only be rated once per request.')
+        return value
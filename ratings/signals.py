@@ -1,21 +1,64 @@
+from decimal import Decimal
 from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
-from .models import Rating
+from movies.cache import invalidate_movie_cards
+from recommendation.cache import invalidate_user_recommendations
+from .bulk import current_batch
+from .histogram import move_rating, rebuild_histograms
+from .models import Rating, Movie
+from .trending import forget_rating, record_rating
 
 
 
 @receiver(post_save, sender=Rating)
-def update_movie_rating_on_save(sender, instance, **kwargs):
+def update_movie_rating_on_save(sender, instance, created, **kwargs):
     """
-    Update the movie's average rating whenever a rating is added or updated.
+    Update the movie's rating totals, average and histogram whenever a rating is added or updated.
+    Only the difference to the stored rating is applied, so the cost does not grow with
+    the number of ratings of the movie.
     """
-    instance.movie.update_average_rating()
+    stored_movie_id, stored_score = getattr(instance, '_stored_rating', (None, None))
+    batch = current_batch()
+    if batch is not None:
+        if created:
+            batch.created([instance])
+        else:
+            batch.changed(instance, stored_movie_id, stored_score)
+    elif created:
+        Movie.adjust_rating_totals(instance.movie_id, count=1, total=instance.score)
+        move_rating(None, None, instance.movie_id, instance.score)
+        record_rating(instance)
+    elif stored_movie_id is None or stored_score is None:
+        # Saved without having been loaded from the database; the previous score is unknown
+        instance.movie.update_average_rating()
+        rebuild_histograms([instance.movie_id])
+    elif stored_movie_id != instance.movie_id:
+        Movie.adjust_rating_totals(stored_movie_id, count=-1, total=-stored_score)
+        Movie.adjust_rating_totals(instance.movie_id, count=1, total=instance.score)
+        move_rating(stored_movie_id, stored_score, instance.movie_id, instance.score)
+    elif stored_score != instance.score:
+        Movie.adjust_rating_totals(instance.movie_id, total=Decimal(str(instance.score)) - stored_score)
+        move_rating(stored_movie_id, stored_score, instance.movie_id, instance.score)
+    instance._stored_rating = (instance.movie_id, instance.score)
+    if batch is None:
+        invalidate_movie_cards({movie_id for movie_id in (stored_movie_id, instance.movie_id) if movie_id is not None})
+        invalidate_user_recommendations(instance.user_id)
     
 
 @receiver(post_delete, sender=Rating)
 def update_movie_rating_on_delete(sender, instance, **kwargs):
     """
-    Update the movie's average rating whenever a rating is deleted.
+    Remove a deleted rating from the movie's rating totals, average and histogram.
     """
-    if instance.movie:
-        instance.movie.update_average_rating()
+    batch = current_batch()
+    if batch is not None:
+        batch.deleted(instance)
+        return
+    movie_id, score = getattr(instance, '_stored_rating', (None, None))
+    if movie_id is None or score is None:
+        movie_id, score = instance.movie_id, instance.score
+    Movie.adjust_rating_totals(movie_id, count=-1, total=-Decimal(str(score)))
+    move_rating(movie_id, score, None, None)
+    invalidate_movie_cards([movie_id])
+    forget_rating(instance)
+    invalidate_user_recommendations(instance.user_id)
@@ -1,6 +1,9 @@
 from celery import shared_task
 from django.utils import timezone
 from .models import Rating
+from .bulk import bulk_ratings, save_ratings
+from .histogram import rebuild_histograms
+from .trending import compact_trending
 from movies.models import Movie
 from django.contrib.auth import get_user_model
 import random
@@ -27,9 +30,30 @@ def schedule_random_ratings(batch_size=100):
             rating = Rating(user=user, movie=movie, score=score, created_at=timezone.now())
             ratings.append(rating)
     
-    # Bulk create ratings to optimize performance
-    Rating.objects.bulk_create(ratings)
+    # Bulk upsert ratings to optimize performance; users may already have rated a movie.
+    # bulk_create sends no signals, so the ratings are registered with the batch as new or
+    # updated, and the batch updates the movie aggregates once
+    with bulk_ratings() as batch:
+        save_ratings(ratings, batch)
     return f"{len(ratings)} ratings have been added for {len(users)} users."
 
 
+@shared_task
+def compact_trending_scores():
+    """
+    Drops the trends of movies that are no longer trending; scheduled by Celery beat.
+    """
+    deleted = compact_trending()
+    logger.info('Compacted %s trending scores', deleted)
+    return deleted
+
 
+@shared_task
+def reconcile_rating_histograms():
+    """
+    Rebuilds every movie's rating histogram from the ratings, repairing any drift of the
+    incremental updates; scheduled by Celery beat.
+    """
+    written = rebuild_histograms()
+    logger.info('Rebuilt %s rating histogram buckets', written)
+    return written
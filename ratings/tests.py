@@ -1,3 +1,223 @@
-from django.test import TestCase
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from movies.models import Movie
+from . import bulk
+from .bulk import BulkRatingBatch, bulk_ratings, save_ratings
+from .histogram import movie_histogram, score_bucket
+from .models import MovieTrend, Rating
+from .trending import activity_key, forget_rating, record_rating, record_ratings, trending_score
+
+User = get_user_model()
+
+
+class RatingTestCase(TestCase):
+    """
+    Base class with a few users and movies, and assertions comparing the precomputed
+    totals and histograms of the movies with their actual ratings.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = [
+            User.objects.create_user(email=f'user{index}@example.com', password='x', phone_number=f'+1555000{index}')
+            for index in range(3)
+        ]
+        cls.movies = [Movie.objects.create(title=f'Movie {index}') for index in range(3)]
+
+    def assertTotals(self, movie, count, total):
+        movie = Movie.objects.get(pk=movie.pk)
+        self.assertEqual(movie.rating_count, count)
+        self.assertEqual(movie.rating_sum, Decimal(str(total)))
+        average = Decimal(str(total)) / count if count else Decimal(0)
+        self.assertEqual(movie.average_rating, average.quantize(Decimal('0.01')))
+
+    def assertConsistent(self):
+        """
+        Every movie's totals and histogram match its ratings.
+        """
+        for movie in Movie.objects.all():
+            scores = list(Rating.objects.filter(movie=movie).values_list('score', flat=True))
+            self.assertTotals(movie, len(scores), sum(scores, Decimal(0)))
+            expected = {str(bucket): 0 for bucket in range(1, 11)}
+            for score in scores:
+                expected[str(score_bucket(score))] += 1
+            self.assertEqual(movie_histogram(movie), expected, movie.title)
+
+    def rate(self, user, movie, score, **kwargs):
+        return Rating.objects.create(user=user, movie=movie, score=Decimal(str(score)), **kwargs)
+
+
+class RatingSignalTests(RatingTestCase):
+
+    def test_create_update_and_delete_keep_totals_and_histogram(self):
+        movie = self.movies[0]
+        rating = self.rate(self.users[0], movie, 8)
+        self.rate(self.users[1], movie, 6)
+        self.assertTotals(movie, 2, 14)
+        self.assertEqual(movie_histogram(movie)['8'], 1)
+
+        rating = Rating.objects.get(pk=rating.pk)
+        rating.score = Decimal('3.0')
+        rating.save()
+        self.assertTotals(movie, 2, 9)
+        self.assertEqual(movie_histogram(movie)['8'], 0)
+        self.assertEqual(movie_histogram(movie)['3'], 1)
+
+        rating.delete()
+        self.assertTotals(movie, 1, 6)
+        self.assertConsistent()
+
+    def test_moving_a_rating_to_another_movie(self):
+        rating = self.rate(self.users[0], self.movies[0], 7)
+        rating = Rating.objects.get(pk=rating.pk)
+        rating.movie = self.movies[1]
+        rating.save()
+        self.assertTotals(self.movies[0], 0, 0)
+        self.assertTotals(self.movies[1], 1, 7)
+        self.assertConsistent()
+
+    def test_new_rating_adds_trending_activity(self):
+        self.rate(self.users[0], self.movies[0], 7)
+        trend = MovieTrend.objects.get(movie=self.movies[0])
+        self.assertAlmostEqual(trending_score(trend.key), 1.0, places=3)
+
+
+class BulkRatingTests(RatingTestCase):
+
+    def write_ratings(self):
+        """
+        Creates, updates and deletes ratings through the model, as inside a batch.
+        """
+        first = self.rate(self.users[0], self.movies[0], 8)
+        self.rate(self.users[1], self.movies[0], 4)
+        second = self.rate(self.users[0], self.movies[1], 9)
+        first = Rating.objects.get(pk=first.pk)
+        first.score = Decimal('2.0')
+        first.save()
+        Rating.objects.get(pk=second.pk).delete()
+
+    def test_recompute_batch_updates_totals_on_exit(self):
+        with bulk_ratings():
+            self.write_ratings()
+            # Nothing is applied before the block exits
+            self.assertTotals(self.movies[0], 0, 0)
+        self.assertTotals(self.movies[0], 2, 6)
+        self.assertTotals(self.movies[1], 0, 0)
+        self.assertConsistent()
+
+    def test_delta_batch_updates_totals_on_exit(self):
+        existing = self.rate(self.users[2], self.movies[1], 5)
+        with bulk_ratings(recompute=False):
+            self.write_ratings()
+            Rating.objects.get(pk=existing.pk).delete()
+        self.assertTotals(self.movies[0], 2, 6)
+        self.assertTotals(self.movies[1], 0, 0)
+        self.assertConsistent()
+
+    def test_nested_blocks_join_the_outermost_batch(self):
+        with bulk_ratings(recompute=False) as outer:
+            with bulk_ratings() as inner:
+                self.assertIs(inner, outer)
+                self.rate(self.users[0], self.movies[0], 7)
+            # The inner block does not apply the batch
+            self.assertTotals(self.movies[0], 0, 0)
+        self.assertTotals(self.movies[0], 1, 7)
+        self.assertConsistent()
+
+    def test_exception_recomputes_written_movies_and_is_raised(self):
+        with self.assertRaisesMessage(ValueError, 'import failed'):
+            with bulk_ratings(recompute=False):
+                self.rate(self.users[0], self.movies[0], 7)
+                raise ValueError('import failed')
+        self.assertTotals(self.movies[0], 1, 7)
+        self.assertConsistent()
+
+    def test_failing_apply_does_not_hide_the_original_exception(self):
+        with mock.patch.object(BulkRatingBatch, 'apply', side_effect=RuntimeError('database is gone')):
+            with self.assertLogs('ratings.bulk', 'ERROR'):
+                with self.assertRaisesMessage(ValueError, 'import failed'):
+                    with bulk_ratings():
+                        raise ValueError('import failed')
+
+    def test_save_ratings_rerating_keeps_totals_and_histogram(self):
+        self.rate(self.users[0], self.movies[0], 8)
+        trend = MovieTrend.objects.get(movie=self.movies[0]).key
+
+        now = timezone.now()
+        with bulk_ratings(recompute=False) as batch:
+            created, updated = save_ratings([
+                Rating(user=self.users[0], movie=self.movies[0], score=Decimal('3.0'), created_at=now, updated_at=now),
+                Rating(user=self.users[0], movie=self.movies[1], score=Decimal('6.0'), created_at=now, updated_at=now),
+            ], batch)
+
+        self.assertEqual([rating.movie_id for rating in created], [self.movies[1].pk])
+        self.assertEqual([rating.movie_id for rating in updated], [self.movies[0].pk])
+        self.assertEqual(Rating.objects.get(user=self.users[0], movie=self.movies[0]).score, Decimal('3.0'))
+        self.assertTotals(self.movies[0], 1, 3)
+        self.assertTotals(self.movies[1], 1, 6)
+        self.assertConsistent()
+        # Re-rating is not new trending activity
+        self.assertEqual(MovieTrend.objects.get(movie=self.movies[0]).key, trend)
+
+    def test_save_ratings_recomputes_pairs_inserted_concurrently(self):
+        upsert_ratings = bulk.upsert_ratings
+
+        def racing_upsert(ratings):
+            # Another writer rates the same pair between the lookup and the upsert
+            Rating.objects.bulk_create([Rating(user=self.users[0], movie=self.movies[0], score=Decimal('2.0'))])
+            return upsert_ratings(ratings)
+
+        now = timezone.now()
+        with mock.patch.object(bulk, 'upsert_ratings', racing_upsert):
+            with bulk_ratings(recompute=False) as batch:
+                created, updated = save_ratings([
+                    Rating(user=self.users[0], movie=self.movies[0], score=Decimal('7.0'), created_at=now, updated_at=now),
+                ], batch)
+        self.assertEqual((len(created), len(updated)), (0, 1))
+        self.assertTotals(self.movies[0], 1, 7)
+        self.assertConsistent()
+
+    def test_save_ratings_in_recompute_batch(self):
+        self.rate(self.users[1], self.movies[2], 9)
+        with bulk_ratings() as batch:
+            save_ratings([Rating(user=user, movie=self.movies[2], score=Decimal('5.0')) for user in self.users], batch)
+        self.assertTotals(self.movies[2], 3, 15)
+        self.assertConsistent()
+
+
+@override_settings(TRENDING_HALF_LIFE=3600)
+class TrendingTests(RatingTestCase):
+
+    def test_score_halves_every_half_life(self):
+        now = timezone.now()
+        key = activity_key(now)
+        self.assertAlmostEqual(trending_score(key, now), 1.0)
+        self.assertAlmostEqual(trending_score(key, now + timedelta(hours=1)), 0.5)
+        self.assertAlmostEqual(trending_score(key, now + timedelta(hours=3)), 0.125)
+
+    def test_record_and_forget(self):
+        now = timezone.now()
+        ratings = [Rating(user=self.users[0], movie=self.movies[0], created_at=now - timedelta(hours=hours)) for hours in (0, 1)]
+        for rating in ratings:
+            record_rating(rating)
+        key = MovieTrend.objects.get(movie=self.movies[0]).key
+        self.assertAlmostEqual(trending_score(key, now), 1.5)
+
+        forget_rating(ratings[0])
+        key = MovieTrend.objects.get(movie=self.movies[0]).key
+        self.assertAlmostEqual(trending_score(key, now), 0.5)
+
+    def test_bulk_record_matches_single_records(self):
+        now = timezone.now()
+        created_ats = [now - timedelta(minutes=minutes) for minutes in (0, 30, 90)]
+        record_ratings([self.movies[0].pk] * 3, created_ats)
+        for created_at in created_ats:
+            record_rating(Rating(movie=self.movies[1], created_at=created_at))
+        keys = dict(MovieTrend.objects.values_list('movie_id', 'key'))
+        self.assertAlmostEqual(keys[self.movies[0].pk], keys[self.movies[1].pk])
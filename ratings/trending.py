@@ -0,0 +1,145 @@
+import math
+
+import numpy as np
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F, FloatField, Value
+from django.db.models.functions import Abs, Exp, Greatest, Ln
+from django.utils import timezone
+
+from .models import MovieTrend, Rating
+
+# Floor for the remaining share of a movie's activity when a rating is removed, so the
+# key stays finite; such rows fall below TRENDING_MIN_SCORE and are pruned by compaction.
+_REMOVAL_FLOOR = 1e-12
+
+
+def decay_rate():
+    """
+    Exponential decay rate per second for the configured TRENDING_HALF_LIFE.
+    """
+    return math.log(2) / settings.TRENDING_HALF_LIFE
+
+
+def activity_key(created_at):
+    """
+    Log-space key of one rating made at `created_at`.
+    """
+    return decay_rate() * created_at.timestamp()
+
+
+def trending_score(key, now=None):
+    """
+    Current trending score of a key: the number of ratings, each decayed by its age.
+    """
+    now = now or timezone.now()
+    return math.exp(key - decay_rate() * now.timestamp())
+
+
+def _log_add(key):
+    """
+    Expression for log(exp(F('key')) + exp(key)), computed without overflow.
+    """
+    key = Value(key, output_field=FloatField())
+    return Greatest(F('key'), key) + Ln(Value(1.0) + Exp(-Abs(F('key') - key)))
+
+
+def _log_subtract(key):
+    """
+    Expression for log(exp(F('key')) - exp(key)), floored to keep the log defined.
+    """
+    key = Value(key, output_field=FloatField())
+    return F('key') + Ln(Greatest(Value(1.0) - Exp(key - F('key')), Value(_REMOVAL_FLOOR)))
+
+
+def add_activity(movie_id, key):
+    """
+    Adds activity with log-space `key` to a movie's trend with a single UPDATE,
+    creating the row for the movie's first rating.
+    """
+    if MovieTrend.objects.filter(movie_id=movie_id).update(key=_log_add(key)):
+        return
+    try:
+        with transaction.atomic():
+            MovieTrend.objects.create(movie_id=movie_id, key=key)
+    except IntegrityError:
+        # Another rating created the row concurrently
+        MovieTrend.objects.filter(movie_id=movie_id).update(key=_log_add(key))
+
+
+def record_rating(rating):
+    """
+    Adds a new rating to its movie's trending score.
+    """
+    add_activity(rating.movie_id, activity_key(rating.created_at))
+
+
+def forget_rating(rating):
+    """
+    Removes a deleted rating from its movie's trending score.
+    """
+    MovieTrend.objects.filter(movie_id=rating.movie_id).update(key=_log_subtract(activity_key(rating.created_at)))
+
+
+def record_ratings(movie_ids, created_ats):
+    """
+    Adds many ratings at once, e.g. after a bulk insert: the activity of each movie is
+    combined in NumPy and applied with one UPDATE per movie.
+    """
+    if not len(movie_ids):
+        return
+    movie_ids = np.asarray(movie_ids, dtype=np.int64)
+    keys = decay_rate() * np.array([created_at.timestamp() for created_at in created_ats], dtype=np.float64)
+    for movie_id, key in zip(*_log_sum_by_movie(movie_ids, keys)):
+        add_activity(int(movie_id), float(key))
+
+
+def _log_sum_by_movie(movie_ids, keys):
+    """
+    Returns (unique movie ids, log(sum(exp(keys))) per movie).
+    """
+    order = np.argsort(movie_ids, kind='stable')
+    movie_ids, keys = movie_ids[order], keys[order]
+    unique, starts = np.unique(movie_ids, return_index=True)
+    return unique, np.logaddexp.reduceat(keys, starts)
+
+
+def compact_trending(now=None):
+    """
+    Deletes the trends of movies whose score has decayed below TRENDING_MIN_SCORE.
+
+    Scores are never rewritten as time passes (the key orders movies at any time), so
+    the only maintenance is dropping movies that stopped trending. Returns the number
+    of deleted rows.
+    """
+    now = now or timezone.now()
+    threshold = math.log(settings.TRENDING_MIN_SCORE) + decay_rate() * now.timestamp()
+    deleted, _ = MovieTrend.objects.filter(key__lt=threshold).delete()
+    return deleted
+
+
+def rebuild_trending(now=None):
+    """
+    Recomputes every trend from the ratings recent enough to still count, e.g. after
+    changing TRENDING_HALF_LIFE or inserting ratings without signals. Only ratings
+    newer than the age at which a single rating decays below TRENDING_MIN_SCORE are read.
+    Returns the number of trending movies.
+    """
+    now = now or timezone.now()
+    horizon = settings.TRENDING_HALF_LIFE * math.log2(1 / settings.TRENDING_MIN_SCORE)
+    recent = Rating.objects.filter(created_at__gte=now - timezone.timedelta(seconds=horizon)).order_by()
+    movie_ids, created_ats = [], []
+    for movie_id, created_at in recent.values_list('movie_id', 'created_at').iterator(chunk_size=10000):
+        movie_ids.append(movie_id)
+        created_ats.append(created_at)
+
+    trends = []
+    if movie_ids:
+        keys = decay_rate() * np.array([created_at.timestamp() for created_at in created_ats], dtype=np.float64)
+        unique, movie_keys = _log_sum_by_movie(np.asarray(movie_ids, dtype=np.int64), keys)
+        trends = [MovieTrend(movie_id=int(movie_id), key=float(key)) for movie_id, key in zip(unique, movie_keys)]
+
+    with transaction.atomic():
+        MovieTrend.objects.all().delete()
+        MovieTrend.objects.bulk_create(trends, batch_size=1000)
+    return len(trends)
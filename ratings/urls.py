@@ -3,5 +3,7 @@ from . import views
 
 urlpatterns = [
     path('movies/<int:movie_id>/ratings/', views.RatingListView.as_view(), name='rating-list'),
+    path('movies/trending/', views.TrendingMoviesView.as_view(), name='trending-movies'),
+    path('ratings/batch/', views.RatingBatchView.as_view(), name='rating-batch'),
     path('ratings/<int:pk>/', views.RatingDetailView.as_view(), name='rating-detail'),
 ]
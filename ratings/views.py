@@ -1,9 +1,18 @@
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import permissions, status
+from rest_framework.pagination import PageNumberPagination
+from django.db import IntegrityError, transaction
 from django.shortcuts import get_object_or_404
-from .models import Rating, Movie
-from .serializers import RatingSerializer
+from django.utils import timezone
+from drf_yasg.utils import swagger_auto_schema
+from drf_yasg import openapi
+from movies.cache import get_movie_cards, card_with_url
+from .models import Rating, Movie, MovieTrend
+from .serializers import RatingSerializer, RatingCompactSerializer, RatingBatchSerializer
+from .bulk import bulk_ratings, save_ratings
+from .pagination import RatingKeysetPagination
+from .trending import trending_score
 
 class RatingListView(APIView):
     """
@@ -12,16 +21,30 @@ class RatingListView(APIView):
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
 
     def get(self, request, movie_id, format=None):
+        """
+        Lists the movie's ratings newest first, one keyset-paginated page at a time.
+        With `?compact=true` only ids, score and creation time are returned.
+        """
         movie = get_object_or_404(Movie, pk=movie_id)
-        ratings = Rating.objects.filter(movie=movie)
-        serializer = RatingSerializer(ratings, many=True)
-        return Response(serializer.data)
+        paginator = RatingKeysetPagination()
+        if request.query_params.get('compact') in ('1', 'true'):
+            ratings = Rating.objects.filter(movie=movie).values('id', 'user_id', 'score', 'created_at')
+            serializer = RatingCompactSerializer(paginator.paginate_queryset(ratings, request, view=self), many=True)
+        else:
+            # The related users and movies are rendered with __str__, so they are joined in
+            ratings = Rating.objects.filter(movie=movie).select_related('user', 'movie')
+            serializer = RatingSerializer(paginator.paginate_queryset(ratings, request, view=self), many=True)
+        return paginator.get_paginated_response(serializer.data)
 
     def post(self, request, movie_id, format=None):
         movie = get_object_or_404(Movie, pk=movie_id)
         serializer = RatingSerializer(data=request.data, context={'request': request})
         if serializer.is_valid():
-            serializer.save(user=request.user, movie=movie)
+            try:
+                with transaction.atomic():
+                    serializer.save(user=request.user, movie=movie)
+            except IntegrityError:
+                return Response({'detail': 'You have already rated this movie; update your rating instead.'}, status=status.HTTP_400_BAD_REQUEST)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -52,3 +75,86 @@ class RatingDetailView(APIView):
             return Response({'detail': 'You do not have permission to delete this rating.'}, status=status.HTTP_403_FORBIDDEN)
         rating.delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class RatingBatchView(APIView):
+    """
+    Create or update many ratings of the current user in one request, e.g. during onboarding.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request, format=None):
+        serializer = RatingBatchSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        scores = {item['movie_id']: item['score'] for item in serializer.validated_data['ratings']}
+
+        # Check that every movie exists with one query
+        missing_movies = scores.keys() - set(Movie.objects.filter(id__in=scores).values_list('id', flat=True))
+        if missing_movies:
+            return Response({'detail': 'Movie not found.', 'movie_ids': sorted(missing_movies)}, status=status.HTTP_404_NOT_FOUND)
+
+        # Upsert all ratings in one statement; the batch then applies each movie's change
+        # to its aggregates and histogram and updates the user's caches once
+        with bulk_ratings(recompute=False) as batch:
+            now = timezone.now()
+            created, updated = save_ratings([
+                Rating(user=request.user, movie_id=movie_id, score=score, created_at=now, updated_at=now)
+                for movie_id, score in scores.items()
+            ], batch)
+
+        return Response({
+            'created': len(created),
+            'updated': len(updated),
+            'ratings': [{'movie_id': movie_id, 'score': str(score)} for movie_id, score in scores.items()],
+        }, status=status.HTTP_200_OK)
+
+
+class TrendingMoviesView(APIView):
+    """
+    List the movies with the most recent rating activity.
+    """
+    permission_classes = [permissions.AllowAny]
+
+    @swagger_auto_schema(
+        operation_summary="Retrieve Trending Movies",
+        operation_description="Fetches movies ordered by their trending score: the number of ratings they received, "
+                              "each counted less the older it is (exponential decay with a configurable half-life).",
+        responses={
+            200: openapi.Response(
+                description="A page of trending movies, most trending first.",
+                schema=openapi.Schema(
+                    type=openapi.TYPE_OBJECT,
+                    properties={
+                        'count': openapi.Schema(type=openapi.TYPE_INTEGER, description="Total number of trending movies."),
+                        'next': openapi.Schema(type=openapi.TYPE_STRING, description="URL to the next page of results.", format=openapi.FORMAT_URI),
+                        'previous': openapi.Schema(type=openapi.TYPE_STRING, description="URL to the previous page of results.", format=openapi.FORMAT_URI),
+                        'results': openapi.Schema(
+                            type=openapi.TYPE_ARRAY,
+                            items=openapi.Items(type=openapi.TYPE_OBJECT, properties={
+                                'id': openapi.Schema(type=openapi.TYPE_INTEGER, description="Movie ID"),
+                                'title': openapi.Schema(type=openapi.TYPE_STRING, description="Title of the movie"),
+                                'trending_score': openapi.Schema(type=openapi.TYPE_NUMBER, description="Decayed number of recent ratings"),
+                            }),
+                            description="Array of trending movies."
+                        )
+                    }
+                )
+            )
+        }
+    )
+    def get(self, request, format=None):
+        # Scores are precomputed by the rating signals; ordering by key orders by current score
+        queryset = MovieTrend.objects.order_by('-key', 'movie_id').values_list('movie_id', 'key')
+
+        paginator = PageNumberPagination()
+        paginator.page_size = 10
+        page = paginator.paginate_queryset(queryset, request)
+
+        now = timezone.now()
+        keys = dict(page)
+        data = [
+            {**card_with_url(card, request), 'trending_score': round(trending_score(keys[card['id']], now), 4)}
+            for card in get_movie_cards(keys)
+        ]
+        return paginator.get_paginated_response(data)
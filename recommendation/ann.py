@@ -0,0 +1,77 @@
+import logging
+import os
+
+import numpy as np
+from annoy import AnnoyIndex
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+INDEX_NAME = 'candidates.ann'
+
+
+def item_vectors(model):
+    """
+    Item factors with the item bias appended as an extra dimension.
+
+    With the user query `[pu, 1]` the inner product is `pu·qi + bi`, which differs from the
+    SVD estimate only by the per-user constant `mu + bu`, so the ranking is the same.
+    """
+    return np.hstack([model.qi, model.bi[:, None]]).astype(np.float32)
+
+
+def query_vector(user_vector):
+    return np.append(user_vector, 1.0).astype(np.float32)
+
+
+def build_candidate_index(model, directory, n_trees=None):
+    """
+    Builds an Annoy index over the item vectors of `model` and writes it into `directory`.
+    Item ids in the index are row positions in the model's item arrays.
+    """
+    n_trees = n_trees or settings.RECOMMENDATION_ANN_TREES
+    vectors = item_vectors(model)
+    index = AnnoyIndex(vectors.shape[1], 'dot')
+    for position, vector in enumerate(vectors):
+        index.add_item(position, vector)
+    index.build(n_trees)
+
+    path = os.path.join(directory, INDEX_NAME)
+    tmp_path = os.path.join(directory, f'.tmp-{INDEX_NAME}')
+    index.save(tmp_path)
+    index.unload()
+    os.replace(tmp_path, path)
+    return path
+
+
+def get_candidate_index(model):
+    """
+    Returns the Annoy index published with `model`, or None if it has none.
+
+    The file is memory-mapped by Annoy, so every worker on the node shares one copy in
+    the page cache. The loaded index is cached on the model object.
+    """
+    if not hasattr(model, '_candidate_index'):
+        index = None
+        path = os.path.join(model.path, INDEX_NAME) if model.path else None
+        if path and os.path.exists(path):
+            index = AnnoyIndex(model.n_factors + 1, 'dot')
+            index.load(path)
+        else:
+            logger.warning('No candidate index for model version %s', model.version)
+        model._candidate_index = index
+    return model._candidate_index
+
+
+def candidate_positions(model, user_vector, count):
+    """
+    Returns up to `count` item positions with the highest `pu·qi + bi` according to the
+    index, or None if the model has no index.
+    """
+    index = get_candidate_index(model)
+    if index is None:
+        return None
+    positions = index.get_nns_by_vector(
+        query_vector(user_vector), count, search_k=settings.RECOMMENDATION_ANN_SEARCH_K
+    )
+    return np.asarray(positions, dtype=np.intp)
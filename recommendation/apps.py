@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class RecommendationConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'recommendation'
+
+    def ready(self):
+        import recommendation.signals
@@ -0,0 +1,222 @@
+import logging
+import uuid
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .executor import run_scoring
+from .registry import ModelNotAvailable, registry
+from .hybrid import load_hybrid_inputs, rank_hybrid, recommend_hybrid
+from .singleflight import acoalesce, coalesce
+
+logger = logging.getLogger(__name__)
+
+
+def recommendations_cache_key(user_id):
+    return f"user_{user_id}_recommendations"
+
+
+def recommendations_generation_key(user_id):
+    return f"user_{user_id}_recommendations_generation"
+
+
+def recommendation_list_key(list_id):
+    return f"recommendation_list_{list_id}"
+
+
+def current_model_version():
+    """
+    Version of the model this process serves, or None if no model has been published.
+    """
+    try:
+        return registry.active()[0]
+    except ModelNotAvailable:
+        return None
+
+
+def user_generation(user_id):
+    """
+    Counter of the user's rating writes, bumped when each write commits.
+    """
+    return cache.get(recommendations_generation_key(user_id), 0)
+
+
+async def auser_generation(user_id):
+    return await cache.aget(recommendations_generation_key(user_id), 0)
+
+
+def bump_user_generation(user_id):
+    key = recommendations_generation_key(user_id)
+    if cache.add(key, 1, timeout=None):
+        return
+    try:
+        cache.incr(key)
+    except ValueError:
+        # The key was evicted between add and incr
+        cache.set(key, 1, timeout=None)
+
+
+def fresh_entry(entry, version, n, generation):
+    """
+    Returns a cache entry if it was computed with `version` from the ratings of
+    `generation` and holds at least `n` items, otherwise None.
+    """
+    if entry and entry['version'] == version and entry.get('generation') == generation and entry['n'] >= n:
+        return entry
+    return None
+
+
+def list_depth(n):
+    """
+    Number of items to rank when at least `n` are needed.
+    """
+    return max(n, settings.RECOMMENDATION_LIST_DEPTH)
+
+
+def get_recommendation_list(user_id, n=10):
+    """
+    Returns the cached ranked list of a user as an entry
+    {'version': ..., 'list_id': ..., 'n': ..., 'items': [(movie_id, predicted rating), ...]}.
+
+    Lists are computed once to RECOMMENDATION_LIST_DEPTH items (or `n` if larger) and
+    cached together with the model version and the user's rating generation they were
+    computed with. An entry is reused while neither has changed; committed rating writes
+    bump the generation (see `invalidate_user_recommendations`). Concurrent misses for
+    the same user, version and generation share one computation (see
+    `recommendation.singleflight`).
+    """
+    version = current_model_version()
+    generation = user_generation(user_id)
+    key = recommendations_cache_key(user_id)
+    entry = fresh_entry(cache.get(key), version, n, generation)
+    if entry is not None:
+        return entry
+
+    depth = list_depth(n)
+    return coalesce(
+        f'{key}_{version}_{generation}_{depth}',
+        lambda: refresh_recommendations(user_id, depth, version=version, generation=generation),
+        lambda: fresh_entry(cache.get(key), version, n, generation),
+    )
+
+
+def get_recommendations(user_id, n=10):
+    """
+    Returns (model version, [(movie_id, predicted rating), ...]) with the top `n` of the
+    user's cached ranked list.
+    """
+    entry = get_recommendation_list(user_id, n)
+    return entry['version'], entry['items'][:n]
+
+
+async def aget_recommendation_list(user_id, n=10):
+    """
+    Async version of `get_recommendation_list` for the async views.
+
+    The cache is read asynchronously. Resolving the model version and loading the
+    ranking inputs (database, catalogue, model files) run through `sync_to_async`, and
+    only the NumPy ranking runs on the scoring thread pool, so the event loop never
+    blocks and the pool threads never open database connections.
+    """
+    version = await sync_to_async(current_model_version)()
+    generation = await auser_generation(user_id)
+    key = recommendations_cache_key(user_id)
+    entry = fresh_entry(await cache.aget(key), version, n, generation)
+    if entry is not None:
+        return entry
+
+    depth = list_depth(n)
+
+    async def compute():
+        inputs = await sync_to_async(load_hybrid_inputs)(user_id)
+        movie_ids, displayed = await run_scoring(rank_hybrid, n=depth, **inputs)
+        entry = new_entry(version, generation, depth, list(zip(movie_ids.tolist(), displayed.tolist())))
+        if await auser_generation(user_id) == generation:
+            await astore_entry(user_id, entry)
+        return entry
+
+    async def lookup():
+        return fresh_entry(await cache.aget(key), version, n, generation)
+
+    return await acoalesce(f'{key}_{version}_{generation}_{depth}', compute, lookup)
+
+
+async def aget_recommendations(user_id, n=10):
+    """
+    Async version of `get_recommendations`.
+    """
+    entry = await aget_recommendation_list(user_id, n)
+    return entry['version'], entry['items'][:n]
+
+
+def new_entry(version, generation, n, items):
+    return {'version': version, 'generation': generation, 'list_id': uuid.uuid4().hex, 'n': n, 'items': items}
+
+
+def store_entry(user_id, entry):
+    """
+    Caches `entry` as the user's current list and as an immutable snapshot that cursors
+    keep paging through after the user's list is replaced. Snapshots only need to
+    outlive a browsing session, so they expire after RECOMMENDATION_LIST_SNAPSHOT_TIMEOUT.
+    """
+    cache.set(recommendations_cache_key(user_id), entry, timeout=settings.RECOMMENDATION_CACHE_TIMEOUT)
+    cache.set(recommendation_list_key(entry['list_id']), entry, timeout=settings.RECOMMENDATION_LIST_SNAPSHOT_TIMEOUT)
+
+
+async def astore_entry(user_id, entry):
+    await cache.aset(recommendations_cache_key(user_id), entry, timeout=settings.RECOMMENDATION_CACHE_TIMEOUT)
+    await cache.aset(recommendation_list_key(entry['list_id']), entry, timeout=settings.RECOMMENDATION_LIST_SNAPSHOT_TIMEOUT)
+
+
+def refresh_recommendations(user_id, n=10, version=None, generation=None):
+    """
+    Computes the ranked list of a user to `list_depth(n)` items and stores it in the cache,
+    unless a rating write committed while it was computed. Returns the new entry.
+    """
+    version = version or current_model_version()
+    if generation is None:
+        generation = user_generation(user_id)
+    depth = list_depth(n)
+    entry = new_entry(version, generation, depth, recommend_hybrid(user_id, n=depth))
+    if user_generation(user_id) == generation:
+        store_entry(user_id, entry)
+    return entry
+
+
+def invalidate_user_recommendations(user_id, recompute=None):
+    """
+    Once the current transaction commits, bumps the user's rating generation, drops
+    their cached recommendations and, if enabled, queues a recompute.
+
+    Lists computed from ratings read before the commit carry the previous generation,
+    so they are neither stored nor served afterwards.
+    """
+    if recompute is None:
+        recompute = settings.RECOMMENDATION_RECOMPUTE_ON_RATING
+
+    def invalidate():
+        bump_user_generation(user_id)
+        cache.delete(recommendations_cache_key(user_id))
+        if recompute:
+            from .tasks import refresh_user_recommendations
+            refresh_user_recommendations.delay(user_id)
+
+    transaction.on_commit(invalidate)
+
+
+def invalidate_many_user_recommendations(user_ids):
+    """
+    Invalidates the cached recommendations of many users once the current transaction
+    commits, e.g. after a bulk rating load. No recomputes are queued; the lists are
+    rebuilt on the users' next request.
+    """
+    user_ids = list(user_ids)
+
+    def invalidate():
+        for user_id in user_ids:
+            bump_user_generation(user_id)
+        cache.delete_many([recommendations_cache_key(user_id) for user_id in user_ids])
+
+    transaction.on_commit(invalidate)
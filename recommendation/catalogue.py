@@ -0,0 +1,163 @@
+import threading
+import time
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+
+from movies.models import Genre, Movie
+
+# Bumped whenever movies, genres or genre memberships change; see `recommendation.signals`.
+GENERATION_KEY = 'recommendation_catalogue_generation'
+
+
+def popcount(words):
+    """
+    Number of set bits in each element of a uint64 array (SWAR bit counting).
+    """
+    words = words - ((words >> np.uint64(1)) & np.uint64(0x5555555555555555))
+    words = (words & np.uint64(0x3333333333333333)) + ((words >> np.uint64(2)) & np.uint64(0x3333333333333333))
+    words = (words + (words >> np.uint64(4))) & np.uint64(0x0F0F0F0F0F0F0F0F)
+    return ((words * np.uint64(0x0101010101010101)) >> np.uint64(56)).astype(np.uint8)
+
+
+class Catalogue:
+    """
+    In-memory snapshot of the movie catalogue used for whole-catalogue ranking.
+
+    Holds the sorted movie ids, their average ratings, each movie's genres as a bitmask
+    (one uint64 word per 64 genres) and the catalogue order by rating, so genre queries
+    run as vectorized bit operations without touching the database.
+    """
+
+    def __init__(self, movie_ids, average_ratings, genre_masks, genre_bits):
+        self.movie_ids = movie_ids
+        self.average_ratings = average_ratings
+        self.genre_masks = genre_masks
+        self.genre_bits = genre_bits
+        # Best rated first; ties keep ascending movie id
+        self.rating_order = np.argsort(-average_ratings, kind='stable')
+        self.genre_masks_by_rating = genre_masks[self.rating_order]
+
+    @classmethod
+    def build(cls):
+        rows = np.array(
+            list(Movie.objects.order_by('id').values_list('id', 'average_rating').iterator(chunk_size=5000)),
+            dtype=np.float64,
+        ).reshape(-1, 2)
+        movie_ids = rows[:, 0].astype(np.int64)
+
+        genres = list(Genre.objects.order_by('id').values_list('id', 'name'))
+        genre_bits = {name: bit for bit, (_, name) in enumerate(genres)}
+        genre_ids = {genre_id: bit for bit, (genre_id, _) in enumerate(genres)}
+        memberships = np.array(
+            [
+                (movie_id, genre_ids[genre_id])
+                for movie_id, genre_id in Movie.genres.through.objects.values_list('movie_id', 'genre_id')
+                if genre_id in genre_ids
+            ],
+            dtype=np.int64,
+        ).reshape(-1, 2)
+
+        genre_masks = np.zeros((len(movie_ids), max(1, -(-len(genre_bits) // 64))), dtype=np.uint64)
+        catalogue = cls(movie_ids, rows[:, 1], genre_masks, genre_bits)
+        positions = catalogue.positions(memberships[:, 0])
+        # Memberships of movies created after the movie query was read are skipped
+        positions, bits = positions[positions >= 0], memberships[positions >= 0, 1]
+        np.bitwise_or.at(genre_masks, (positions, bits // 64), np.left_shift(np.uint64(1), (bits % 64).astype(np.uint64)))
+        catalogue.genre_masks_by_rating = genre_masks[catalogue.rating_order]
+        return catalogue
+
+    def __len__(self):
+        return len(self.movie_ids)
+
+    def positions(self, movie_ids):
+        """
+        Returns the positions of `movie_ids` in the catalogue, with -1 for unknown movies.
+        """
+        movie_ids = np.asarray(movie_ids, dtype=np.int64)
+        if not len(self.movie_ids):
+            return np.full(movie_ids.shape, -1, dtype=np.intp)
+        positions = np.minimum(np.searchsorted(self.movie_ids, movie_ids), len(self.movie_ids) - 1)
+        return np.where(self.movie_ids[positions] == movie_ids, positions, -1)
+
+    def genre_mask(self, genre_names):
+        """
+        Bitmask row for a set of genre names; unknown names are ignored.
+        """
+        mask = np.zeros(self.genre_masks.shape[1], dtype=np.uint64)
+        for name in genre_names:
+            bit = self.genre_bits.get(name)
+            if bit is not None:
+                mask[bit // 64] |= np.uint64(1) << np.uint64(bit % 64)
+        return mask
+
+    def genre_matches(self, genre_names, masks=None):
+        """
+        Number of `genre_names` each movie belongs to, in catalogue order.
+        """
+        masks = self.genre_masks if masks is None else masks
+        return popcount(masks & self.genre_mask(genre_names)).sum(axis=1, dtype=np.int32)
+
+    def top_rated_matching(self, genre_names, n):
+        """
+        Positions of the `n` best rated movies matching the preferred genres: any of them
+        for a single preferred genre, at least two of them for several, all movies for none.
+        """
+        if not genre_names:
+            return self.rating_order[:n]
+        required = 1 if len(genre_names) == 1 else 2
+        matches = self.genre_matches(genre_names, masks=self.genre_masks_by_rating)
+        return self.rating_order[matches >= required][:n]
+
+
+class CatalogueCache:
+    """
+    Per-process holder of the catalogue snapshot.
+
+    The snapshot is rebuilt when the shared catalogue generation changes (checked at most
+    every RECOMMENDATION_MODEL_CHECK_INTERVAL seconds) and in any case after
+    RECOMMENDATION_CATALOGUE_TTL seconds, which picks up drifting average ratings.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._catalogue = None
+        self._built_at = None
+        self._generation = None
+        self._checked_at = None
+
+    def get(self):
+        if self._catalogue is not None and not self._stale():
+            return self._catalogue
+        with self._lock:
+            if self._catalogue is None or self._stale():
+                self._generation = cache.get(GENERATION_KEY)
+                self._catalogue = Catalogue.build()
+                self._built_at = self._checked_at = time.monotonic()
+        return self._catalogue
+
+    def _stale(self):
+        now = time.monotonic()
+        if now - self._built_at >= settings.RECOMMENDATION_CATALOGUE_TTL:
+            return True
+        if now - self._checked_at < settings.RECOMMENDATION_MODEL_CHECK_INTERVAL:
+            return False
+        self._checked_at = now
+        return cache.get(GENERATION_KEY) != self._generation
+
+
+catalogue = CatalogueCache()
+
+
+def invalidate_catalogue():
+    """
+    Marks every worker's catalogue snapshot as stale.
+    """
+    if cache.add(GENERATION_KEY, 1, timeout=None):
+        return
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        # The key expired between add and incr
+        cache.set(GENERATION_KEY, 1, timeout=None)
@@ -0,0 +1,125 @@
+import logging
+import os
+import threading
+import time
+
+import numpy as np
+from django.conf import settings
+from scipy import sparse
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.preprocessing import normalize
+
+from movies.models import Movie
+from .neighbours import NeighbourTable
+
+logger = logging.getLogger(__name__)
+
+CONTENT_NEIGHBOURS_NAME = 'content_neighbours.npz'
+
+
+def content_neighbours_path():
+    return os.path.join(str(settings.RECOMMENDATION_MODEL_DIR), CONTENT_NEIGHBOURS_NAME)
+
+
+def build_content_vectors(overviews, genre_rows, genre_cols, genre_weight=None):
+    """
+    Builds one sparse, L2-normalized content vector per movie.
+
+    The vector is the TF-IDF of the overview followed by a one-hot genre block scaled
+    by `genre_weight`. `genre_rows`/`genre_cols` give the (movie row, genre column)
+    pairs of the genre block. Everything stays sparse, so memory grows with the number
+    of terms and genres rather than with the vocabulary size times the catalogue size.
+    """
+    if genre_weight is None:
+        genre_weight = settings.RECOMMENDATION_CONTENT_GENRE_WEIGHT
+
+    vectorizer = TfidfVectorizer(stop_words='english', max_features=settings.RECOMMENDATION_CONTENT_MAX_TERMS, dtype=np.float32)
+    try:
+        text = vectorizer.fit_transform(overview or '' for overview in overviews)
+    except ValueError:
+        # Every overview was empty or made of stop words
+        text = sparse.csr_matrix((len(overviews), 0), dtype=np.float32)
+
+    n_genres = int(genre_cols.max()) + 1 if len(genre_cols) else 0
+    genres = sparse.csr_matrix(
+        (np.ones(len(genre_rows), dtype=np.float32), (genre_rows, genre_cols)),
+        shape=(len(overviews), n_genres),
+    )
+    genres = normalize(genres) * genre_weight
+    return normalize(sparse.hstack([text, genres], format='csr'))
+
+
+def build_content_neighbours(k=None):
+    """
+    Builds the top-K content neighbour table for the whole catalogue from `Movie.overview`
+    and `Movie.genres` and writes it next to the recommendation models.
+    """
+    k = k or settings.RECOMMENDATION_CONTENT_NEIGHBOURS
+    movie_ids, overviews = [], []
+    for movie_id, overview in Movie.objects.order_by('id').values_list('id', 'overview').iterator(chunk_size=2000):
+        movie_ids.append(movie_id)
+        overviews.append(overview)
+    movie_ids = np.asarray(movie_ids, dtype=np.int64)
+
+    memberships = np.array(
+        list(Movie.genres.through.objects.values_list('movie_id', 'genre_id')), dtype=np.int64
+    ).reshape(-1, 2)
+    genre_rows = np.searchsorted(movie_ids, memberships[:, 0])
+    # Memberships of movies added since the catalogue was read have no row
+    known = genre_rows < len(movie_ids)
+    known[known] = movie_ids[genre_rows[known]] == memberships[known, 0]
+    memberships, genre_rows = memberships[known], genre_rows[known]
+    _, genre_cols = np.unique(memberships[:, 1], return_inverse=True)
+
+    vectors = build_content_vectors(overviews, genre_rows, genre_cols.reshape(-1))
+    table = NeighbourTable.build(movie_ids, vectors, k, chunk_size=settings.RECOMMENDATION_NEIGHBOUR_CHUNK_SIZE)
+
+    path = content_neighbours_path()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    table.save(path)
+    logger.info('Built content neighbours for %s movies', len(movie_ids))
+    return table
+
+
+class ContentNeighbours:
+    """
+    Per-process holder of the content neighbour table, reloaded when the file on disk changes.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._table = None
+        self._mtime = None
+        self._checked_at = None
+
+    def get(self):
+        """
+        Returns the current NeighbourTable, or None if it has not been built yet.
+        """
+        now = time.monotonic()
+        if self._checked_at is not None and now - self._checked_at < settings.RECOMMENDATION_MODEL_CHECK_INTERVAL:
+            return self._table
+        with self._lock:
+            try:
+                mtime = os.stat(content_neighbours_path()).st_mtime_ns
+            except FileNotFoundError:
+                mtime = None
+            if mtime is not None and mtime != self._mtime:
+                self._table = NeighbourTable.load(content_neighbours_path())
+                self._mtime = mtime
+            # Marked as checked only once loaded, so concurrent callers wait for the table
+            self._checked_at = now
+        return self._table
+
+
+content_neighbours = ContentNeighbours()
+
+
+def similar_movies(movie_id, limit=10):
+    """
+    Returns [(movie_id, similarity), ...] for the movies most similar in content to `movie_id`.
+    """
+    table = content_neighbours.get()
+    if table is None:
+        return []
+    return table.neighbours_of(movie_id, limit=limit)
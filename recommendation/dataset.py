@@ -0,0 +1,94 @@
+from collections import namedtuple
+
+import numpy as np
+from django.conf import settings
+from django.db.models import FloatField
+from django.db.models.functions import Cast
+from surprise import Trainset
+
+from ratings.models import Rating
+
+
+RatingArrays = namedtuple('RatingArrays', ['users', 'items', 'scores'])
+RatingArrays.__doc__ = """
+Aligned arrays of rating triples: int32 user ids, int32 movie ids and float32 scores.
+"""
+
+
+def load_rating_arrays(queryset=None, chunk_size=None):
+    """
+    Streams (user_id, movie_id, score) from the database into preallocated NumPy arrays.
+
+    Rows are read in keyset pages of `chunk_size` ordered by primary key, each page a
+    short index range query that resumes after the last id of the previous one, so
+    every backend streams the table (MySQL's client would buffer a whole
+    `.iterator()` result). Pages are copied straight into int32/float32 arrays, so no
+    list of Python tuples or `Decimal` scores is ever held for the whole table. Scores
+    are cast to floats by the database.
+    """
+    chunk_size = chunk_size or settings.RECOMMENDATION_RATINGS_CHUNK_SIZE
+    queryset = (Rating.objects.all() if queryset is None else queryset).order_by()
+
+    capacity = queryset.count()
+    users = np.empty(capacity, dtype=np.int32)
+    items = np.empty(capacity, dtype=np.int32)
+    scores = np.empty(capacity, dtype=np.float32)
+
+    rows = queryset.annotate(score_value=Cast('score', FloatField())).values_list(
+        'pk', 'user_id', 'movie_id', 'score_value'
+    ).order_by('pk')
+
+    filled, last_pk = 0, None
+    while True:
+        page = rows if last_pk is None else rows.filter(pk__gt=last_pk)
+        chunk = list(page[:chunk_size])
+        if not chunk:
+            break
+        last_pk = chunk[-1][0]
+        stop = filled + len(chunk)
+        if stop > capacity:
+            # Ratings were added while streaming; grow instead of dropping them
+            capacity = max(stop, capacity * 2)
+            users, items, scores = (np.resize(array, capacity) for array in (users, items, scores))
+        block = np.array([row[1:] for row in chunk], dtype=np.float64)
+        users[filled:stop] = block[:, 0]
+        items[filled:stop] = block[:, 1]
+        scores[filled:stop] = block[:, 2]
+        filled = stop
+
+    return RatingArrays(users[:filled], items[:filled], scores[:filled])
+
+
+def build_trainset(ratings, rating_scale=(1, 10)):
+    """
+    Builds a Surprise `Trainset` directly from `RatingArrays`, without going through a
+    DataFrame and `Dataset`. Inner ids follow the sorted raw ids.
+    """
+    raw_users, inner_users = np.unique(ratings.users, return_inverse=True)
+    raw_items, inner_items = np.unique(ratings.items, return_inverse=True)
+    scores = ratings.scores.astype(np.float64)
+
+    return Trainset(
+        ur=_group(inner_users, inner_items, scores, len(raw_users)),
+        ir=_group(inner_items, inner_users, scores, len(raw_items)),
+        n_users=len(raw_users),
+        n_items=len(raw_items),
+        n_ratings=len(scores),
+        rating_scale=rating_scale,
+        raw2inner_id_users={raw: inner for inner, raw in enumerate(raw_users.tolist())},
+        raw2inner_id_items={raw: inner for inner, raw in enumerate(raw_items.tolist())},
+    )
+
+
+def _group(keys, others, scores, n_keys):
+    """
+    Groups (other, score) pairs by key into the {key: [(other, score), ...]} lists Surprise expects.
+    """
+    order = np.argsort(keys, kind='stable')
+    bounds = np.searchsorted(keys[order], np.arange(n_keys + 1))
+    others = others[order].tolist()
+    scores = scores[order].tolist()
+    return {
+        key: list(zip(others[bounds[key]:bounds[key + 1]], scores[bounds[key]:bounds[key + 1]]))
+        for key in range(n_keys)
+    }
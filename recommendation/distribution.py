@@ -0,0 +1,194 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+import uuid
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# Location of the published versions and their manifest in Django's storage
+STORAGE_PREFIX = 'recommendation/models'
+MANIFEST_NAME = 'manifest.json'
+# Folder of a published version holding the files installed at the model directory root
+SHARED_DIR = 'shared'
+
+# Bytes read per round trip when hashing or copying artifact files
+COPY_CHUNK_SIZE = 1024 * 1024
+
+
+class ChecksumMismatch(Exception):
+    """
+    Raised when a downloaded artifact file does not match the checksum in the manifest.
+    """
+
+
+def storage_path(*parts):
+    return '/'.join((STORAGE_PREFIX, *parts))
+
+
+def _copy(source, destination):
+    """
+    Copies file object `source` to `destination` in chunks. Returns (sha256 hex digest, size).
+    """
+    digest, size = hashlib.sha256(), 0
+    while True:
+        chunk = source.read(COPY_CHUNK_SIZE)
+        if not chunk:
+            return digest.hexdigest(), size
+        digest.update(chunk)
+        size += len(chunk)
+        if destination is not None:
+            destination.write(chunk)
+
+
+def _replace(storage, name, content):
+    """
+    Saves `content` under exactly `name`; storages append a suffix instead of overwriting.
+    """
+    if storage.exists(name):
+        storage.delete(name)
+    saved = storage.save(name, content)
+    if saved != name:
+        raise RuntimeError(f'Storage saved {name} as {saved}.')
+
+
+def _upload(storage, name, path):
+    """
+    Uploads the local file `path` to `name`. Returns its manifest entry.
+    """
+    with open(path, 'rb') as file:
+        sha256, size = _copy(file, None)
+        file.seek(0)
+        _replace(storage, name, file)
+    return {'sha256': sha256, 'size': size}
+
+
+def publish_to_storage(version, directory, shared=(), storage=None):
+    """
+    Uploads the artifact files of a local version directory to `storage` and then points
+    the manifest at the version. The manifest is written last, so nodes never see a
+    version whose files are still being uploaded. Returns the manifest.
+
+    `shared` lists files kept at the root of the model directory rather than in a version,
+    such as the content neighbours; those that exist are shipped with the version and
+    installed next to it on every node.
+    """
+    storage = storage or default_storage
+    files = {}
+    for name in sorted(os.listdir(directory)):
+        path = os.path.join(directory, name)
+        if name.startswith('.') or not os.path.isfile(path):
+            continue
+        files[name] = _upload(storage, storage_path(version, name), path)
+
+    shared_files = {}
+    for path in shared:
+        if os.path.isfile(path):
+            name = os.path.basename(path)
+            shared_files[name] = _upload(storage, storage_path(version, SHARED_DIR, name), path)
+
+    manifest = {'version': version, 'published_at': timezone.now().isoformat(), 'files': files, 'shared': shared_files}
+    _replace(storage, storage_path(MANIFEST_NAME), ContentFile(json.dumps(manifest, indent=2).encode()))
+    logger.info('Published model version %s to storage (%s files)', version, len(files) + len(shared_files))
+    return manifest
+
+
+def read_manifest(storage=None):
+    """
+    Returns the published manifest, or None if there is none or it cannot be read yet.
+    """
+    storage = storage or default_storage
+    try:
+        with storage.open(storage_path(MANIFEST_NAME), 'rb') as file:
+            return json.loads(file.read())
+    except (FileNotFoundError, ValueError):
+        # Not published yet, or caught between the delete and save of a new manifest
+        return None
+
+
+def _download(storage, name, path, expected):
+    """
+    Downloads `name` to the local `path` and checks it against its manifest entry.
+    """
+    with storage.open(name, 'rb') as source, open(path, 'wb') as file:
+        sha256, size = _copy(source, file)
+        file.flush()
+        os.fsync(file.fileno())
+    if sha256 != expected['sha256'] or size != expected['size']:
+        raise ChecksumMismatch(f'{name} does not match the manifest.')
+
+
+def download_version(manifest, model_dir, storage=None):
+    """
+    Downloads the version named by `manifest` into `model_dir`, verifying every file.
+
+    Files are written to a hidden partial directory unique to this call and checked
+    against the manifest's sizes and SHA-256 digests; only a complete, verified copy is
+    renamed to the version directory. If another process on the node finished first,
+    its copy is kept. Returns the version directory.
+    """
+    storage = storage or default_storage
+    version = manifest['version']
+    directory = os.path.join(model_dir, version)
+    if os.path.isdir(directory):
+        return directory
+
+    partial = os.path.join(model_dir, f'.partial-{version}-{uuid.uuid4().hex[:8]}')
+    os.makedirs(partial)
+    try:
+        for name, expected in manifest['files'].items():
+            _download(storage, storage_path(version, name), os.path.join(partial, name), expected)
+        try:
+            os.rename(partial, directory)
+        except OSError:
+            if not os.path.isdir(directory):
+                raise
+    finally:
+        shutil.rmtree(partial, ignore_errors=True)
+    logger.info('Downloaded model version %s from storage', version)
+    return directory
+
+
+def download_shared(manifest, model_dir, storage=None):
+    """
+    Installs the shared files of the version named by `manifest` at the root of
+    `model_dir`. Each file is verified in a temporary file and swapped in with
+    `os.replace`, so readers see either the old or the new file.
+    """
+    storage = storage or default_storage
+    version = manifest['version']
+    for name, expected in manifest.get('shared', {}).items():
+        path = os.path.join(model_dir, name)
+        partial = os.path.join(model_dir, f'.partial-{name}-{uuid.uuid4().hex[:8]}')
+        try:
+            _download(storage, storage_path(version, SHARED_DIR, name), partial, expected)
+            os.replace(partial, path)
+        finally:
+            if os.path.exists(partial):
+                os.unlink(partial)
+
+
+def sync_from_storage(registry, storage=None):
+    """
+    Makes the version published in storage the active local version of `registry`.
+
+    Reads the manifest and only downloads when its version differs from the local one,
+    installs the version's shared files, then activates it with the registry's atomic
+    marker swap. Returns the version the
+    manifest names, or None if nothing has been published.
+    """
+    manifest = read_manifest(storage)
+    if manifest is None:
+        return None
+    version = manifest['version']
+    if version != registry.active_version():
+        os.makedirs(registry.model_dir, exist_ok=True)
+        download_version(manifest, registry.model_dir, storage)
+        download_shared(manifest, registry.model_dir, storage)
+        registry.activate(version)
+    return version
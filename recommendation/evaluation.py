@@ -0,0 +1,273 @@
+import tempfile
+import time
+import tracemalloc
+from collections import namedtuple
+
+import numpy as np
+from django.conf import settings
+from surprise import SVD
+
+from .ann import build_candidate_index
+from .catalogue import Catalogue
+from .content import build_content_vectors
+from .dataset import RatingArrays, build_trainset
+from .hybrid import rank_hybrid
+from .neighbours import NeighbourTable
+from .scoring import FactorModel, rank_items
+from .utils import SVD_PARAMS
+
+# Number of ratings generated for each named scale
+SCALES = {'10k': 10_000, '100k': 100_000, '1m': 1_000_000}
+
+SyntheticData = namedtuple('SyntheticData', ['catalogue', 'train', 'test', 'preferred_genres', 'overviews', 'item_genres'])
+SyntheticData.__doc__ = """
+A generated catalogue with its ratings split into train and test `RatingArrays`.
+`preferred_genres` maps each user id to their declared genre names.
+"""
+
+Strategy = namedtuple('Strategy', ['name', 'recommend', 'predict'])
+Strategy.__doc__ = """
+A recommendation strategy under evaluation: `recommend(user_id, n)` returns the
+recommended movie ids and `predict(user_ids, movie_ids)` the ratings it would display.
+"""
+
+
+def generate_synthetic_data(n_ratings, seed=42, n_genres=20, n_factors=10, test_fraction=0.2):
+    """
+    Generates a deterministic catalogue and `n_ratings` ratings for the same `seed`.
+
+    Scores follow a latent factor model plus a boost for each of the user's preferred
+    genres a movie belongs to, so both collaborative and genre signals carry information.
+    Which movies a user rates is skewed towards popular movies and towards movies the user
+    likes. About 15% of users declare no genre preferences. A `test_fraction` of each
+    user's ratings is held out.
+    """
+    rng = np.random.default_rng(seed)
+    n_users = max(50, n_ratings // 50)
+    n_items = max(200, n_ratings // 50)
+
+    # Every movie has one to three genres; every user prefers one to three of them
+    item_genres = np.zeros((n_items, n_genres), dtype=bool)
+    for item, count in enumerate(rng.integers(1, 4, size=n_items)):
+        item_genres[item, rng.choice(n_genres, size=count, replace=False)] = True
+    user_genres = np.zeros((n_users, n_genres), dtype=bool)
+    for user, count in enumerate(rng.integers(1, 4, size=n_users)):
+        user_genres[user, rng.choice(n_genres, size=count, replace=False)] = True
+    declares = rng.random(n_users) >= 0.15
+
+    user_factors = rng.normal(0, 0.6, size=(n_users, n_factors))
+    item_factors = rng.normal(0, 0.6, size=(n_items, n_factors))
+    user_biases = rng.normal(0, 0.5, size=n_users)
+    item_biases = rng.normal(0, 0.8, size=n_items)
+    popularity = np.log(rng.pareto(1.5, size=n_items) + 1.0)
+
+    activity = rng.lognormal(0, 0.6, size=n_users)
+    counts = rng.multinomial(n_ratings, activity / activity.sum())
+    counts = np.clip(counts, 2, n_items // 2)
+
+    users, items, scores = [], [], []
+    for start in range(0, n_users, 256):
+        stop = min(start + 256, n_users)
+        affinity = (
+            user_factors[start:stop] @ item_factors.T
+            + item_biases
+            + user_genres[start:stop].astype(np.float64) @ item_genres.T.astype(np.float64)
+        )
+        true_scores = 5.0 + user_biases[start:stop, None] + affinity
+        # Gumbel top-k draws the rated movies without replacement
+        keys = popularity + 0.5 * affinity + rng.gumbel(size=affinity.shape)
+        for row, user in enumerate(range(start, stop)):
+            rated = np.argpartition(-keys[row], counts[user] - 1)[:counts[user]]
+            noisy = true_scores[row, rated] + rng.normal(0, 0.5, size=len(rated))
+            users.append(np.full(len(rated), user + 1, dtype=np.int32))
+            items.append(rated.astype(np.int32) + 1)
+            scores.append(np.round(np.clip(noisy, 1, 10), 1).astype(np.float32))
+
+    users, items, scores = np.concatenate(users), np.concatenate(items), np.concatenate(scores)
+    held_out = rng.random(len(users)) < test_fraction
+    train = RatingArrays(users[~held_out], items[~held_out], scores[~held_out])
+    test = RatingArrays(users[held_out], items[held_out], scores[held_out])
+
+    genre_names = [f'Genre {genre}' for genre in range(n_genres)]
+    movie_ids = np.arange(1, n_items + 1, dtype=np.int64)
+    rating_sums = np.bincount(train.items, weights=train.scores, minlength=n_items + 1)[1:]
+    rating_counts = np.bincount(train.items, minlength=n_items + 1)[1:]
+    average_ratings = np.round(np.divide(rating_sums, rating_counts, out=np.zeros(n_items), where=rating_counts > 0), 2)
+
+    genre_masks = np.zeros((n_items, -(-n_genres // 64)), dtype=np.uint64)
+    rows, genres = np.nonzero(item_genres)
+    np.bitwise_or.at(genre_masks, (rows, genres // 64), np.left_shift(np.uint64(1), (genres % 64).astype(np.uint64)))
+    catalogue = Catalogue(movie_ids, average_ratings, genre_masks, {name: bit for bit, name in enumerate(genre_names)})
+
+    # Overviews name the movie's strongest latent themes, so content similarity is informative
+    themes = np.argsort(-item_factors, axis=1)[:, :3]
+    overviews = [' '.join(f'theme{theme}' for theme in row) for row in themes.tolist()]
+
+    preferred_genres = {
+        user + 1: [genre_names[genre] for genre in np.flatnonzero(user_genres[user])] if declares[user] else []
+        for user in range(n_users)
+    }
+    return SyntheticData(catalogue, train, test, preferred_genres, overviews, item_genres)
+
+
+def build_strategies(data, workdir, names=None):
+    """
+    Trains the models for `data` and returns the strategies named in `names` (all by default).
+
+    Every strategy runs the same array-level code as its counterpart in
+    `recommendation.utils` and `recommendation.hybrid`, minus the database reads:
+    'svd' and 'svd_ann' are `get_top_n_recommendations` with exact and ANN retrieval,
+    'genre' is `recommend_based_on_genres`, and 'hybrid' and 'hybrid_ann' are
+    `recommend_hybrid` with exact and ANN retrieval.
+    """
+    movies = data.catalogue
+    algo = SVD(**SVD_PARAMS, random_state=0)
+    algo.fit(build_trainset(data.train, rating_scale=(1, 10)))
+    model = FactorModel.from_surprise(algo, version='evaluation', path=workdir)
+    build_candidate_index(model, workdir)
+
+    rows, cols = np.nonzero(data.item_genres)
+    table = NeighbourTable.build(
+        movies.movie_ids, build_content_vectors(data.overviews, rows, cols),
+        settings.RECOMMENDATION_CONTENT_NEIGHBOURS, chunk_size=settings.RECOMMENDATION_NEIGHBOUR_CHUNK_SIZE,
+    )
+
+    ratings_by_user = _group_ratings(data.train)
+    global_mean = float(data.train.scores.mean())
+
+    def predict_svd(user_ids, movie_ids):
+        return model.predict_many(user_ids, movie_ids)
+
+    def predict_average(user_ids, movie_ids):
+        positions = movies.positions(movie_ids)
+        estimates = np.full(len(positions), global_mean)
+        estimates[positions >= 0] = movies.average_ratings[positions[positions >= 0]]
+        return estimates
+
+    def recommend_svd(retrieval):
+        def recommend(user_id, n):
+            user_vector, user_bias = model.user_factors(user_id)
+            rated = [movie_id for movie_id, _ in ratings_by_user.get(user_id, [])]
+            return rank_items(model, user_vector, user_bias, rated, n, retrieval=retrieval)[0]
+        return recommend
+
+    def recommend_genre(user_id, n):
+        return movies.movie_ids[movies.top_rated_matching(data.preferred_genres[user_id], n)]
+
+    def recommend_hybrid(retrieval):
+        def recommend(user_id, n):
+            return rank_hybrid(
+                movies, n, ratings_by_user.get(user_id, []), data.preferred_genres[user_id],
+                model=model, user_id=user_id, table=table, retrieval=retrieval,
+            )[0]
+        return recommend
+
+    strategies = [
+        Strategy('svd', recommend_svd('exact'), predict_svd),
+        Strategy('svd_ann', recommend_svd('ann'), predict_svd),
+        Strategy('genre', recommend_genre, predict_average),
+        Strategy('hybrid', recommend_hybrid('exact'), predict_svd),
+        Strategy('hybrid_ann', recommend_hybrid('ann'), predict_svd),
+    ]
+    return [strategy for strategy in strategies if names is None or strategy.name in names]
+
+
+def evaluate_strategy(strategy, data, user_ids, k=10, relevance_threshold=None):
+    """
+    Measures the quality and cost of one strategy over `user_ids`.
+
+    A held-out movie is relevant when its score is at least `relevance_threshold`;
+    precision@k and recall@k are averaged over users with at least one relevant movie.
+    RMSE is computed over every held-out rating with the rating the strategy displays.
+    Latency is measured per call without tracing; peak memory comes from a second pass
+    under `tracemalloc`.
+    """
+    if relevance_threshold is None:
+        relevance_threshold = settings.RECOMMENDATION_HYBRID_LIKED_SCORE
+    relevant = _group_relevant(data.test, relevance_threshold)
+
+    latencies = np.empty(len(user_ids), dtype=np.float64)
+    precisions, recalls = [], []
+    started = time.perf_counter()
+    for index, user_id in enumerate(user_ids):
+        call_started = time.perf_counter()
+        recommended = strategy.recommend(user_id, k)
+        latencies[index] = time.perf_counter() - call_started
+
+        hits = len(relevant[user_id].intersection(np.asarray(recommended).tolist()))
+        precisions.append(hits / k)
+        recalls.append(hits / len(relevant[user_id]))
+    elapsed = time.perf_counter() - started
+
+    tracemalloc.start()
+    try:
+        baseline = tracemalloc.get_traced_memory()[0]
+        for user_id in user_ids:
+            strategy.recommend(user_id, k)
+        peak = tracemalloc.get_traced_memory()[1] - baseline
+    finally:
+        tracemalloc.stop()
+
+    estimates = strategy.predict(data.test.users.astype(np.int64), data.test.items.astype(np.int64))
+    rmse = float(np.sqrt(np.mean((estimates - data.test.scores) ** 2))) if len(estimates) else float('nan')
+
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) * 1000 if len(latencies) else (float('nan'),) * 3
+    return {
+        'strategy': strategy.name,
+        'users': len(user_ids),
+        f'precision@{k}': float(np.mean(precisions)) if precisions else float('nan'),
+        f'recall@{k}': float(np.mean(recalls)) if recalls else float('nan'),
+        'rmse': rmse,
+        'p50_ms': float(p50),
+        'p95_ms': float(p95),
+        'p99_ms': float(p99),
+        'throughput_per_s': len(user_ids) / elapsed if elapsed else float('nan'),
+        'peak_memory_mb': peak / 2 ** 20,
+    }
+
+
+def evaluate(n_ratings, k=10, n_users=500, seed=42, strategies=None, relevance_threshold=None):
+    """
+    Generates a synthetic dataset of `n_ratings` ratings, trains the models on it and
+    evaluates each strategy on up to `n_users` users with relevant held-out movies.
+    Returns a summary of the dataset and a list of per-strategy results.
+    """
+    if relevance_threshold is None:
+        relevance_threshold = settings.RECOMMENDATION_HYBRID_LIKED_SCORE
+    data = generate_synthetic_data(n_ratings, seed=seed)
+    candidates = np.array(sorted(_group_relevant(data.test, relevance_threshold)), dtype=np.int64)
+    rng = np.random.default_rng(seed)
+    user_ids = np.sort(rng.choice(candidates, size=min(n_users, len(candidates)), replace=False)).tolist()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        started = time.perf_counter()
+        built = build_strategies(data, workdir, names=strategies)
+        summary = {
+            'ratings': len(data.train.users) + len(data.test.users),
+            'movies': len(data.catalogue),
+            'users': len(data.preferred_genres),
+            'train_seconds': time.perf_counter() - started,
+        }
+        results = [evaluate_strategy(strategy, data, user_ids, k, relevance_threshold) for strategy in built]
+    return summary, results
+
+
+def _group_ratings(ratings):
+    """
+    Groups `RatingArrays` into {user_id: [(movie_id, score), ...]}.
+    """
+    grouped = {}
+    for user_id, movie_id, score in zip(ratings.users.tolist(), ratings.items.tolist(), ratings.scores.tolist()):
+        grouped.setdefault(user_id, []).append((movie_id, score))
+    return grouped
+
+
+def _group_relevant(ratings, threshold):
+    """
+    Returns {user_id: set of movie ids scored at least `threshold`}.
+    """
+    relevant = {}
+    keep = ratings.scores >= threshold
+    for user_id, movie_id in zip(ratings.users[keep].tolist(), ratings.items[keep].tolist()):
+        relevant.setdefault(user_id, set()).add(movie_id)
+    return relevant
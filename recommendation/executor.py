@@ -0,0 +1,39 @@
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+
+_executor = None
+_lock = threading.Lock()
+
+
+def scoring_executor():
+    """
+    Returns the process-wide thread pool for CPU-bound scoring, sized by
+    RECOMMENDATION_SCORING_THREADS.
+
+    NumPy releases the GIL in its matrix kernels, so scoring on these threads keeps the
+    event loop free. The pool is bounded, so a burst of requests queues for a thread
+    instead of oversubscribing the CPU. Jobs must be pure computation over loaded
+    arrays: these threads are outside Django's request cycle, so database connections
+    opened on them would never be closed. Load inputs with `sync_to_async` first.
+    """
+    global _executor
+    if _executor is None:
+        with _lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=settings.RECOMMENDATION_SCORING_THREADS,
+                    thread_name_prefix='recommendation-scoring',
+                )
+    return _executor
+
+
+async def run_scoring(func, *args, **kwargs):
+    """
+    Runs `func(*args, **kwargs)` on the scoring thread pool and awaits its result.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(scoring_executor(), functools.partial(func, *args, **kwargs))
@@ -0,0 +1,182 @@
+import numpy as np
+from django.conf import settings
+from django.contrib.auth import get_user_model
+
+from ratings.models import Rating
+from . import ann
+from .catalogue import catalogue
+from .content import content_neighbours
+from .registry import ModelNotAvailable, registry
+from .scoring import top_n_positions
+from .utils import get_preferred_genres, get_user_factors
+
+User = get_user_model()
+
+
+def svd_signal(catalogue, model, user_vector, user_bias, candidates=None):
+    """
+    SVD estimates for every catalogue movie, clipped to the rating scale.
+    Movies the model does not know get the user's baseline, as in Surprise. If catalogue
+    positions `candidates` are given, only those are scored and the rest keep the baseline.
+    """
+    estimates = np.full(len(catalogue), model.global_mean + user_bias, dtype=np.float64)
+    rows = np.arange(len(catalogue)) if candidates is None else candidates
+    positions = model.item_positions(catalogue.movie_ids[rows])
+    known = positions >= 0
+    estimates[rows[known]] += model.bi[positions[known]] + model.qi[positions[known]] @ user_vector
+    return model.clip(estimates)
+
+
+def svd_candidates(catalogue, model, user_vector, count):
+    """
+    Catalogue positions of the `count` movies the model's Annoy index rates highest for
+    the user, or None if the model was published without an index.
+    """
+    positions = ann.candidate_positions(model, user_vector, count)
+    if positions is None:
+        return None
+    positions = catalogue.positions(model.item_ids[positions])
+    return positions[positions >= 0]
+
+
+def content_signal(catalogue, table, liked_movie_ids):
+    """
+    For every catalogue movie, its highest content similarity to any of the liked movies.
+    """
+    similarity = np.zeros(len(catalogue), dtype=np.float32)
+    if table is None or not len(liked_movie_ids):
+        return similarity
+    neighbour_ids, scores = table.neighbours_of_many(liked_movie_ids)
+    positions = catalogue.positions(neighbour_ids)
+    known = positions >= 0
+    np.maximum.at(similarity, positions[known], scores[known])
+    return similarity
+
+
+def blend(signals, weights, size):
+    """
+    Weighted sum of the available signals (each scaled to [0, 1]); weights of missing
+    signals are redistributed over the others so cold and warm users share one scale.
+    """
+    available = {name: signal for name, signal in signals.items() if signal is not None and weights.get(name)}
+    total = sum(weights[name] for name in available)
+    scores = np.zeros(size, dtype=np.float64)
+    for name, signal in available.items():
+        scores += (weights[name] / total) * signal
+    return scores
+
+
+def hybrid_rank(catalogue, n, rated_movie_ids=(), svd_estimates=None, svd_confidence=1.0,
+                content_similarity=None, genre_matches=None, n_preferred=0, weights=None, rating_scale=(1, 10),
+                candidates=None):
+    """
+    Ranks the whole catalogue in one vectorized pass and returns the positions of the top `n`.
+
+    Blends the SVD estimate, content similarity to the user's liked movies, the share of
+    the user's preferred genres each movie matches and the movie's average rating.
+    Signals that do not apply to the user are passed as None and left out of the blend.
+    If catalogue positions `candidates` are given, only those movies can be recommended.
+    """
+    weights = dict(weights or settings.RECOMMENDATION_HYBRID_WEIGHTS)
+    low, high = rating_scale
+    if svd_estimates is not None:
+        weights['svd'] = weights.get('svd', 0) * svd_confidence
+    signals = {
+        'svd': None if svd_estimates is None else (svd_estimates - low) / (high - low),
+        'content': content_similarity if content_similarity is not None and content_similarity.any() else None,
+        'genre': None if genre_matches is None or not n_preferred else genre_matches / n_preferred,
+        'rating': catalogue.average_ratings / high,
+    }
+    scores = blend(signals, weights, len(catalogue))
+
+    if candidates is not None:
+        excluded = np.ones(len(catalogue), dtype=bool)
+        excluded[candidates] = False
+        scores[excluded] = -np.inf
+    rated = catalogue.positions(np.fromiter(rated_movie_ids, dtype=np.int64))
+    scores[rated[rated >= 0]] = -np.inf
+    top = top_n_positions(scores, n)
+    return top[np.isfinite(scores[top])]
+
+
+def rank_hybrid(movies, n, ratings, preferred_genres, model=None, user_id=None, table=None, retrieval=None):
+    """
+    Hybrid ranking over already loaded inputs; returns (movie ids, ratings) arrays.
+
+    `ratings` are the user's (movie_id, score) pairs, `model` the active FactorModel or
+    None and `table` the content NeighbourTable or None. Nothing is read from the database.
+
+    With `retrieval='ann'` (RECOMMENDATION_RETRIEVAL by default) and a user with latent
+    factors, only the candidates from the model's Annoy index and the content neighbours
+    of the user's liked movies are scored and ranked, instead of the whole catalogue.
+    """
+    rated_movie_ids = [movie_id for movie_id, _ in ratings]
+    liked_movie_ids = [movie_id for movie_id, score in ratings if score >= settings.RECOMMENDATION_HYBRID_LIKED_SCORE]
+    content_similarity = content_signal(movies, table, liked_movie_ids)
+
+    svd_estimates, svd_confidence, rating_scale, candidates = None, 1.0, (1, 10), None
+    if model is not None and (ratings or model.user_position(user_id) is not None):
+        user_vector, user_bias = get_user_factors(model, user_id, ratings=ratings)
+        if (retrieval or settings.RECOMMENDATION_RETRIEVAL) == 'ann':
+            count = max(n * settings.RECOMMENDATION_ANN_OVERFETCH, n + len(rated_movie_ids))
+            candidates = svd_candidates(movies, model, user_vector, count)
+            if candidates is not None:
+                candidates = np.union1d(candidates, np.flatnonzero(content_similarity))
+        svd_estimates = svd_signal(movies, model, user_vector, user_bias, candidates)
+        rating_scale = model.rating_scale
+        if model.user_position(user_id) is None:
+            svd_confidence = min(1.0, len(ratings) / max(settings.RECOMMENDATION_COLD_START_RATINGS, 1))
+
+    genre_matches = movies.genre_matches(preferred_genres).astype(np.float32) if preferred_genres else None
+
+    top_positions = hybrid_rank(
+        movies, n, rated_movie_ids,
+        svd_estimates=svd_estimates, svd_confidence=svd_confidence,
+        content_similarity=content_similarity,
+        genre_matches=genre_matches, n_preferred=len(preferred_genres),
+        rating_scale=rating_scale, candidates=candidates,
+    )
+    displayed = svd_estimates if svd_estimates is not None else movies.average_ratings
+    return movies.movie_ids[top_positions], displayed[top_positions].astype(float)
+
+
+def load_hybrid_inputs(user_id, ratings=None, preferred_genres=None):
+    """
+    Loads everything `rank_hybrid` needs for a user: the catalogue, the user's
+    (movie_id, score) `ratings` and `preferred_genres` (read from the database unless
+    passed in), the active model (or None) and the content neighbour table.
+
+    This is the only part of a hybrid recommendation that touches the database, so async
+    callers run it through `sync_to_async` and keep the scoring threads free of the ORM.
+    """
+    if ratings is None:
+        ratings = list(Rating.objects.filter(user_id=user_id).values_list('movie_id', 'score'))
+    if preferred_genres is None:
+        preferred_genres = get_preferred_genres(User.objects.get(id=user_id))
+    try:
+        model = registry.get()
+    except ModelNotAvailable:
+        model = None
+    return {
+        'movies': catalogue.get(),
+        'ratings': ratings,
+        'preferred_genres': preferred_genres,
+        'model': model,
+        'user_id': user_id,
+        'table': content_neighbours.get(),
+    }
+
+
+def recommend_hybrid(user_id, n=10, ratings=None, preferred_genres=None):
+    """
+    Recommends movies for any user, cold or warm, as [(movie_id, rating), ...].
+
+    The rating is the SVD estimate when the user has latent factors and the movie's
+    average rating otherwise. The SVD signal is weighted by how established the user is:
+    fully for users the model was trained with, and ramping up to full weight over the
+    first RECOMMENDATION_COLD_START_RATINGS ratings for users folded in since.
+    The user's (movie_id, score) `ratings` and `preferred_genres` are read from the
+    database unless they are passed in.
+    """
+    movie_ids, displayed = rank_hybrid(n=n, **load_hybrid_inputs(user_id, ratings, preferred_genres))
+    return list(zip(movie_ids.tolist(), displayed.tolist()))
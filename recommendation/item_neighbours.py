@@ -0,0 +1,61 @@
+import logging
+import os
+
+import numpy as np
+from django.conf import settings
+
+from .neighbours import NeighbourTable
+from .registry import registry
+
+logger = logging.getLogger(__name__)
+
+NEIGHBOURS_NAME = 'neighbours.npz'
+
+
+def build_item_neighbours(model, directory, k=None):
+    """
+    Computes the top-K cosine neighbours of every movie in the item-factor space of
+    `model` and writes them into `directory` next to the model arrays.
+
+    The factors are L2-normalized and multiplied block by block, so peak memory is
+    `RECOMMENDATION_NEIGHBOUR_CHUNK_SIZE x n_items` rather than the full similarity matrix.
+    """
+    k = k or settings.RECOMMENDATION_ITEM_NEIGHBOURS
+    vectors = np.asarray(model.qi, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    vectors = np.divide(vectors, norms, out=np.zeros_like(vectors), where=norms > 0)
+    table = NeighbourTable.build(model.item_ids, vectors, k, chunk_size=settings.RECOMMENDATION_NEIGHBOUR_CHUNK_SIZE)
+
+    path = os.path.join(directory, NEIGHBOURS_NAME)
+    table.save(path)
+    logger.info('Built item-factor neighbours for %s movies', len(table.movie_ids))
+    return table
+
+
+def get_item_neighbours(model):
+    """
+    Returns the item-factor NeighbourTable published with `model`, or None if it has none.
+    The loaded table is cached on the model object, so it is read once per version.
+    """
+    if not hasattr(model, '_item_neighbours'):
+        table = None
+        path = os.path.join(model.path, NEIGHBOURS_NAME) if model.path else None
+        if path and os.path.exists(path):
+            table = NeighbourTable.load(path)
+        else:
+            logger.warning('No item-factor neighbours for model version %s', model.version)
+        model._item_neighbours = table
+    return model._item_neighbours
+
+
+def more_like_this(movie_id, limit=10):
+    """
+    Returns (model version, [(movie_id, similarity), ...]) for the movies closest to
+    `movie_id` in the active model's item-factor space, i.e. rated alike by the same users.
+    Raises ModelNotAvailable if no model has been published.
+    """
+    version, model = registry.active()
+    table = get_item_neighbours(model)
+    if table is None:
+        return version, []
+    return version, table.neighbours_of(movie_id, limit=limit)
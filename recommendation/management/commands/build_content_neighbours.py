@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from recommendation.content import build_content_neighbours, content_neighbours_path
+
+
+class Command(BaseCommand):
+    help = 'Precomputes the top-K content-similar movies for every movie from overviews and genres'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--k', type=int, default=None, help='Number of neighbours to keep per movie')
+
+    def handle(self, *args, **options):
+        table = build_content_neighbours(k=options['k'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Stored content neighbours for {len(table.movie_ids)} movies in {content_neighbours_path()}.'
+        ))
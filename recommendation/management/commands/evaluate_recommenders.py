@@ -0,0 +1,49 @@
+import json
+
+from django.core.management.base import BaseCommand
+from recommendation.evaluation import SCALES, evaluate
+
+STRATEGIES = ('svd', 'svd_ann', 'genre', 'hybrid', 'hybrid_ann')
+
+
+class Command(BaseCommand):
+    help = 'Evaluates the recommendation strategies on deterministic synthetic data for quality, latency and memory'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scales', nargs='+', choices=sorted(SCALES), default=list(SCALES), help='Dataset sizes to evaluate')
+        parser.add_argument('--strategies', nargs='+', choices=STRATEGIES, default=list(STRATEGIES), help='Strategies to evaluate')
+        parser.add_argument('--k', type=int, default=10, help='Length of the recommendation lists')
+        parser.add_argument('--users', type=int, default=500, help='Number of users to evaluate per scale')
+        parser.add_argument('--seed', type=int, default=42, help='Random seed of the synthetic data')
+        parser.add_argument('--relevance-threshold', type=float, default=None, help='Lowest held-out score counted as relevant')
+        parser.add_argument('--output', help='Also write the results as JSON to this file')
+
+    def handle(self, *args, **options):
+        k = options['k']
+        report = []
+        for scale in options['scales']:
+            summary, results = evaluate(
+                SCALES[scale], k=k, n_users=options['users'], seed=options['seed'],
+                strategies=options['strategies'], relevance_threshold=options['relevance_threshold'],
+            )
+            report.append({'scale': scale, **summary, 'results': results})
+
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                f"{scale}: {summary['ratings']} ratings, {summary['users']} users, {summary['movies']} movies, "
+                f"trained in {summary['train_seconds']:.1f}s"
+            ))
+            self.stdout.write(
+                f"{'strategy':<10}{'P@' + str(k):>8}{'R@' + str(k):>8}{'RMSE':>8}"
+                f"{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'req/s':>10}{'peak MB':>9}"
+            )
+            for result in results:
+                self.stdout.write(
+                    f"{result['strategy']:<10}{result[f'precision@{k}']:>8.4f}{result[f'recall@{k}']:>8.4f}"
+                    f"{result['rmse']:>8.4f}{result['p50_ms']:>9.3f}{result['p95_ms']:>9.3f}{result['p99_ms']:>9.3f}"
+                    f"{result['throughput_per_s']:>10.0f}{result['peak_memory_mb']:>9.2f}"
+                )
+
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                json.dump(report, file, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Wrote the evaluation results to {options['output']}."))
@@ -0,0 +1,45 @@
+import logging
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from recommendation.distribution import sync_from_storage
+from recommendation.registry import registry
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Downloads and activates the model version published to Django's storage, e.g. when a node starts"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--watch', action='store_true',
+            help='Keep polling the manifest and install every newly published version',
+        )
+        parser.add_argument(
+            '--interval', type=int, default=None,
+            help='Seconds between polls with --watch (default: RECOMMENDATION_MODEL_SYNC_INTERVAL)',
+        )
+
+    def handle(self, *args, **options):
+        if options['watch']:
+            self.watch(options['interval'] or settings.RECOMMENDATION_MODEL_SYNC_INTERVAL)
+            return
+
+        version = sync_from_storage(registry)
+        if version is None:
+            raise CommandError('No model has been published to storage yet.')
+        self.stdout.write(self.style.SUCCESS(f"Model version {version} is active in {registry.model_dir}."))
+
+    def watch(self, interval):
+        """
+        Syncs every `interval` seconds; serving workers pick new versions up from the marker.
+        """
+        while True:
+            try:
+                sync_from_storage(registry)
+            except Exception:
+                # Keep serving the local version and retry on the next poll
+                logger.exception('Could not sync the recommendation model from storage')
+            time.sleep(interval)
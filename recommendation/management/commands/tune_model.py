@@ -0,0 +1,38 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from recommendation.dataset import load_rating_arrays
+from recommendation.tuning import DEFAULT_PARAM_GRID, save_best_params, tune
+
+
+class Command(BaseCommand):
+    help = 'Cross-validates SVD hyperparameters in parallel and stores the best ones for train_model'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--grid', type=json.loads, default=None,
+                            help='Parameter grid as JSON, e.g. \'{"n_factors": [50, 100], "reg_all": [0.02, 0.1]}\'')
+        parser.add_argument('--n-iter', type=int, default=None,
+                            help='Evaluate this many random combinations of the grid instead of all of them')
+        parser.add_argument('--cv', type=int, default=3, help='Number of cross-validation folds')
+        parser.add_argument('--workers', type=int, default=None, help='Number of worker processes (default: all cores)')
+        parser.add_argument('--seed', type=int, default=0, help='Seed for fold assignment, random search and SVD')
+
+    def handle(self, *args, **options):
+        if options['cv'] < 2:
+            raise CommandError('--cv must be at least 2.')
+        ratings = load_rating_arrays()
+        if not len(ratings.scores):
+            raise CommandError('There are no ratings to tune on.')
+
+        param_grid = options['grid'] or DEFAULT_PARAM_GRID
+        results = tune(
+            ratings, param_grid=param_grid, cv=options['cv'], n_iter=options['n_iter'],
+            workers=options['workers'], seed=options['seed'],
+        )
+        for result in results:
+            self.stdout.write(f"RMSE {result['rmse']:.4f} (+/- {result['rmse_std']:.4f})  MAE {result['mae']:.4f}  {result['params']}")
+
+        path = save_best_params(
+            results, cv=options['cv'], seed=options['seed'], n_ratings=len(ratings.scores), param_grid=param_grid,
+        )
+        self.stdout.write(self.style.SUCCESS(f"Best parameters {results[0]['params']} written to {path}."))
@@ -0,0 +1,109 @@
+import os
+
+import numpy as np
+from scipy import sparse
+
+
+def top_k_neighbours(vectors, k, chunk_size=256):
+    """
+    Computes the `k` most similar rows for every row of `vectors` by inner product.
+
+    `vectors` may be a dense array or a sparse matrix and should be L2-normalized for
+    cosine similarity. Similarities are computed `chunk_size` rows at a time, so peak
+    memory is `chunk_size x n_rows` instead of the full `n_rows x n_rows` matrix.
+    Returns (neighbours, scores) of shape (n_rows, k); rows with fewer than `k`
+    neighbours are padded with -1 and a score of 0.
+    """
+    n_rows = vectors.shape[0]
+    k = min(k, max(n_rows - 1, 0))
+    neighbours = np.full((n_rows, k), -1, dtype=np.int32)
+    scores = np.zeros((n_rows, k), dtype=np.float32)
+    if k == 0:
+        return neighbours, scores
+
+    transposed = vectors.T
+    for start in range(0, n_rows, chunk_size):
+        stop = min(start + chunk_size, n_rows)
+        block = vectors[start:stop] @ transposed
+        block = block.toarray() if sparse.issparse(block) else np.asarray(block)
+        block = block.astype(np.float32, copy=False)
+        # A row is never its own neighbour
+        block[np.arange(stop - start), np.arange(start, stop)] = -np.inf
+
+        candidates = np.argpartition(-block, k - 1, axis=1)[:, :k]
+        candidate_scores = np.take_along_axis(block, candidates, axis=1)
+        order = np.argsort(-candidate_scores, axis=1, kind='stable')
+        neighbours[start:stop] = np.take_along_axis(candidates, order, axis=1)
+        scores[start:stop] = np.take_along_axis(candidate_scores, order, axis=1)
+
+    # Drop neighbours without any similarity
+    empty = ~(scores > 0)
+    neighbours[empty] = -1
+    scores[empty] = 0
+    return neighbours, scores
+
+
+class NeighbourTable:
+    """
+    Precomputed top-K neighbours for a set of movies.
+
+    `movie_ids` is sorted; row `i` of `neighbours` holds positions into `movie_ids`
+    (or -1 for padding) and row `i` of `scores` their similarities, best first.
+    Looking up a movie is a binary search plus an O(K) slice.
+    """
+
+    def __init__(self, movie_ids, neighbours, scores):
+        self.movie_ids = movie_ids
+        self.neighbours = neighbours
+        self.scores = scores
+
+    @classmethod
+    def build(cls, movie_ids, vectors, k, chunk_size=256):
+        """
+        Builds the table from one vector per movie; `movie_ids` need not be sorted.
+        """
+        movie_ids = np.asarray(movie_ids, dtype=np.int64)
+        order = np.argsort(movie_ids, kind='stable')
+        neighbours, scores = top_k_neighbours(vectors[order], k, chunk_size=chunk_size)
+        return cls(movie_ids[order], neighbours, scores)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(data['movie_ids'], data['neighbours'], data['scores'])
+
+    def save(self, path):
+        """
+        Writes the table as an uncompressed .npz file, replacing `path` atomically.
+        """
+        tmp_path = os.path.join(os.path.dirname(path), f'.tmp-{os.path.basename(path)}')
+        with open(tmp_path, 'wb') as file:
+            np.savez(file, movie_ids=self.movie_ids, neighbours=self.neighbours, scores=self.scores)
+        os.replace(tmp_path, path)
+
+    def neighbours_of(self, movie_id, limit=None):
+        """
+        Returns [(movie_id, score), ...] for the neighbours of `movie_id`, best first.
+        Movies that were not in the table when it was built have no neighbours.
+        """
+        position = int(np.searchsorted(self.movie_ids, movie_id))
+        if position >= len(self.movie_ids) or self.movie_ids[position] != movie_id:
+            return []
+        neighbours = self.neighbours[position, :limit]
+        scores = self.scores[position, :limit]
+        valid = neighbours >= 0
+        return list(zip(self.movie_ids[neighbours[valid]].tolist(), scores[valid].tolist()))
+
+    def neighbours_of_many(self, movie_ids):
+        """
+        Returns flat (neighbour movie ids, scores) arrays for all neighbours of `movie_ids`.
+        """
+        movie_ids = np.asarray(movie_ids, dtype=np.int64)
+        if not len(self.movie_ids):
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        positions = np.minimum(np.searchsorted(self.movie_ids, movie_ids), len(self.movie_ids) - 1)
+        positions = positions[self.movie_ids[positions] == movie_ids]
+        neighbours = self.neighbours[positions].ravel()
+        scores = self.scores[positions].ravel()
+        valid = neighbours >= 0
+        return self.movie_ids[neighbours[valid]], scores[valid]
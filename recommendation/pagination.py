@@ -0,0 +1,113 @@
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
+
+from .cache import aget_recommendation_list, get_recommendation_list, recommendation_list_key, recommendations_cache_key
+
+CURSOR_SALT = 'recommendation.pagination.cursor'
+
+
+class InvalidCursor(Exception):
+    """
+    Raised for cursors that were tampered with or issued to another user.
+    """
+
+
+class ExpiredCursor(Exception):
+    """
+    Raised when the ranked list a cursor points into is no longer cached.
+    """
+
+
+def encode_cursor(user_id, entry, offset):
+    """
+    Returns an opaque, signed cursor for `offset` into the ranked list `entry`.
+    The cursor names the list snapshot and the model version it was ranked with.
+    """
+    return signing.dumps({'u': user_id, 'l': entry['list_id'], 'v': entry['version'], 'o': offset}, salt=CURSOR_SALT)
+
+
+def decode_cursor(cursor, user_id):
+    """
+    Returns (list_id, offset) of a cursor issued to `user_id`.
+    """
+    try:
+        payload = signing.loads(cursor, salt=CURSOR_SALT)
+    except signing.BadSignature:
+        raise InvalidCursor('Invalid cursor.')
+    if payload.get('u') != user_id:
+        raise InvalidCursor('Invalid cursor.')
+    return payload['l'], payload['o']
+
+
+def page_size_from(value):
+    """
+    Validates a requested page size; missing values get RECOMMENDATION_PAGE_SIZE.
+    Raises ValueError for values that are not integers between 1 and RECOMMENDATION_MAX_PAGE_SIZE.
+    """
+    if value in (None, ''):
+        return settings.RECOMMENDATION_PAGE_SIZE
+    page_size = int(value)
+    if not 1 <= page_size <= settings.RECOMMENDATION_MAX_PAGE_SIZE:
+        raise ValueError(f'page_size must be between 1 and {settings.RECOMMENDATION_MAX_PAGE_SIZE}.')
+    return page_size
+
+
+def snapshot_keys(user_id, list_id):
+    return recommendation_list_key(list_id), recommendations_cache_key(user_id)
+
+
+def find_snapshot(user_id, list_id, cached):
+    """
+    Returns the list `list_id` from the `cached` snapshot and current list of the user.
+    Snapshots expire sooner than the current list, which can be served from directly
+    while it is still the list the cursor was issued for.
+    """
+    snapshot_key, current_key = snapshot_keys(user_id, list_id)
+    entry = cached.get(snapshot_key)
+    if entry is None and cached.get(current_key, {}).get('list_id') == list_id:
+        entry = cached[current_key]
+    if entry is None:
+        raise ExpiredCursor('The recommendation list has expired; start again without a cursor.')
+    return entry
+
+
+def slice_page(user_id, entry, offset, page_size):
+    """
+    Returns (model version, page items, next cursor or None) for a slice of `entry`.
+    """
+    items = entry['items'][offset:offset + page_size]
+    next_offset = offset + page_size
+    next_cursor = encode_cursor(user_id, entry, next_offset) if next_offset < len(entry['items']) else None
+    return entry['version'], items, next_cursor
+
+
+def recommendation_page(user_id, cursor=None, page_size=None):
+    """
+    Returns (model version, [(movie_id, predicted rating), ...], next cursor) for one page
+    of a user's recommendations.
+
+    The first page comes from the user's current ranked list, computing it if needed.
+    Later pages are slices of the same list snapshot the cursor was issued for, so the
+    user sees no duplicates or gaps even if the list is recomputed while they scroll.
+    """
+    page_size = page_size or settings.RECOMMENDATION_PAGE_SIZE
+    if cursor is None:
+        return slice_page(user_id, get_recommendation_list(user_id, page_size), 0, page_size)
+
+    list_id, offset = decode_cursor(cursor, user_id)
+    entry = find_snapshot(user_id, list_id, cache.get_many(snapshot_keys(user_id, list_id)))
+    return slice_page(user_id, entry, offset, page_size)
+
+
+async def arecommendation_page(user_id, cursor=None, page_size=None):
+    """
+    Async version of `recommendation_page`.
+    """
+    page_size = page_size or settings.RECOMMENDATION_PAGE_SIZE
+    if cursor is None:
+        return slice_page(user_id, await aget_recommendation_list(user_id, page_size), 0, page_size)
+
+    list_id, offset = decode_cursor(cursor, user_id)
+    entry = find_snapshot(user_id, list_id, await cache.aget_many(snapshot_keys(user_id, list_id)))
+    return slice_page(user_id, entry, offset, page_size)
@@ -0,0 +1,192 @@
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.utils import timezone
+
+from .scoring import FactorModel
+
+logger = logging.getLogger(__name__)
+
+# Name of the file holding the version string of the active model.
+MARKER_NAME = 'CURRENT'
+
+
+class ModelNotAvailable(Exception):
+    """
+    Raised when no trained model has been published to the model directory yet.
+    """
+
+
+def new_version():
+    """
+    Returns a sortable, unique version string such as '20240818143800-3f9c2a1b'.
+    """
+    return f"{timezone.now().strftime('%Y%m%d%H%M%S')}-{uuid.uuid4().hex[:8]}"
+
+
+def atomic_write(path, data):
+    """
+    Writes bytes to `path` through a temporary file and `os.replace`, so readers
+    never observe a partially written file.
+    """
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-')
+    try:
+        with os.fdopen(fd, 'wb') as file:
+            file.write(data)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+class ModelRegistry:
+    """
+    Process-wide holder of the active recommendation model, served as a `FactorModel`.
+
+    Each published model lives in its own version directory of memory-mapped arrays
+    under the model directory, and a small marker file names the active version. The registry
+    loads the active artifact once and only re-reads the marker every
+    `check_interval` seconds; when the marker points to a new version, the new
+    model is loaded and swapped in with a single assignment, so requests in
+    flight keep using the model they started with.
+
+    The registry only ever reads the local marker. On nodes that serve versions
+    published to Django's storage, `sync_model --watch` downloads and activates them
+    out of band, so requests never wait for a download.
+    """
+
+    def __init__(self, model_dir=None, check_interval=None):
+        self._model_dir = model_dir
+        self._check_interval = check_interval
+        self._lock = threading.Lock()
+        self._active = None  # (version, model)
+        self._checked_at = None
+
+    @property
+    def model_dir(self):
+        return str(self._model_dir or settings.RECOMMENDATION_MODEL_DIR)
+
+    @property
+    def check_interval(self):
+        if self._check_interval is not None:
+            return self._check_interval
+        return settings.RECOMMENDATION_MODEL_CHECK_INTERVAL
+
+    @property
+    def version(self):
+        """
+        The version of the model currently loaded in this process, or None.
+        """
+        active = self._active
+        return active[0] if active else None
+
+    def version_dir(self, version):
+        return os.path.join(self.model_dir, version)
+
+    def active_version(self):
+        """
+        Reads the version marker from disk. Returns None if nothing has been published.
+        """
+        try:
+            with open(os.path.join(self.model_dir, MARKER_NAME)) as file:
+                return file.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def get(self):
+        """
+        Returns the active model, loading or hot-swapping it if the marker changed.
+        """
+        return self.active()[1]
+
+    def active(self):
+        """
+        Returns a consistent (version, model) pair for the active model.
+        """
+        active = self._active
+        if active is not None and not self._check_due():
+            return active
+
+        # Only one thread per process reloads; the others keep serving the current model.
+        if not self._lock.acquire(blocking=active is None):
+            return active
+        try:
+            active = self._active
+            if active is None or self._check_due():
+                self._checked_at = time.monotonic()
+                version = self.active_version()
+                if version is not None and (active is None or version != active[0]):
+                    model = self._load(version)
+                    self._active = active = (version, model)
+                    logger.info('Loaded recommendation model version %s', version)
+        finally:
+            self._lock.release()
+
+        if active is None:
+            raise ModelNotAvailable(f'No trained model has been published to {self.model_dir}.')
+        return active
+
+    def reload(self):
+        """
+        Forces the marker to be re-read on the next access.
+        """
+        self._checked_at = None
+
+    def publish(self, model, **meta):
+        """
+        Writes the FactorModel `model` into a new version directory and atomically points
+        the marker at it. Returns the new version string.
+        """
+        version = self.stage(model, **meta)
+        self.activate(version)
+        return version
+
+    def stage(self, model, **meta):
+        """
+        Writes the FactorModel `model` into a new version directory without activating it,
+        so companion artifacts can be added to the directory before workers see the version.
+        Extra keyword arguments are stored in the version's metadata.
+        """
+        version = new_version()
+        model.version = version
+        model.save(self.version_dir(version), **meta)
+        return version
+
+    def activate(self, version):
+        """
+        Points the marker at an already written version directory and prunes old versions.
+        """
+        atomic_write(os.path.join(self.model_dir, MARKER_NAME), version.encode())
+        self.reload()
+        self.prune(keep=settings.RECOMMENDATION_MODEL_KEEP_VERSIONS)
+
+    def prune(self, keep):
+        """
+        Deletes all but the newest `keep` version directories. The active version is never deleted.
+        """
+        active_version = self.active_version()
+        versions = sorted(
+            name for name in os.listdir(self.model_dir)
+            if os.path.isdir(os.path.join(self.model_dir, name)) and not name.startswith('.')
+        )
+        for version in versions[:-keep] if keep else versions:
+            if version != active_version:
+                shutil.rmtree(self.version_dir(version), ignore_errors=True)
+
+    def _check_due(self):
+        return self._checked_at is None or time.monotonic() - self._checked_at >= self.check_interval
+
+    def _load(self, version):
+        return FactorModel.load(self.version_dir(version), version=version)
+
+
+registry = ModelRegistry()
@@ -0,0 +1,255 @@
+import json
+import os
+
+import numpy as np
+from django.conf import settings
+
+from . import ann
+
+META_NAME = 'meta.json'
+ARRAY_NAMES = ('pu', 'qi', 'bu', 'bi', 'user_ids', 'item_ids')
+
+
+class FactorModel:
+    """
+    Serving view of a trained SVD model.
+
+    Holds the learned factor and bias arrays with the raw user and movie ids sorted,
+    so ids are resolved with a binary search instead of per-request dictionaries and
+    whole-catalogue scoring is a single matrix-vector product.
+    """
+
+    def __init__(self, version, global_mean, pu, qi, bu, bi, user_ids, item_ids, rating_scale=(1, 10), path=None):
+        self.version = version
+        self.path = path
+        self.global_mean = float(global_mean)
+        self.pu = pu
+        self.qi = qi
+        self.bu = bu
+        self.bi = bi
+        self.user_ids = user_ids
+        self.item_ids = item_ids
+        self.rating_scale = tuple(rating_scale)
+
+    @classmethod
+    def from_surprise(cls, algo, version=None, path=None):
+        """
+        Builds a FactorModel from a fitted Surprise SVD, reordering rows by raw id.
+        """
+        trainset = algo.trainset
+        user_ids = np.array([trainset.to_raw_uid(inner) for inner in range(trainset.n_users)], dtype=np.int64)
+        item_ids = np.array([trainset.to_raw_iid(inner) for inner in range(trainset.n_items)], dtype=np.int64)
+        user_order = np.argsort(user_ids, kind='stable')
+        item_order = np.argsort(item_ids, kind='stable')
+        return cls(
+            version=version,
+            global_mean=trainset.global_mean,
+            pu=np.ascontiguousarray(algo.pu[user_order], dtype=np.float32),
+            qi=np.ascontiguousarray(algo.qi[item_order], dtype=np.float32),
+            bu=np.ascontiguousarray(algo.bu[user_order], dtype=np.float32),
+            bi=np.ascontiguousarray(algo.bi[item_order], dtype=np.float32),
+            user_ids=user_ids[user_order],
+            item_ids=item_ids[item_order],
+            rating_scale=trainset.rating_scale,
+            path=path,
+        )
+
+    @classmethod
+    def load(cls, directory, version=None, mmap_mode='r'):
+        """
+        Loads a model saved with `save`. By default the arrays are memory-mapped read-only,
+        so every process on the node shares the same page-cache copy and loading is
+        nearly instant regardless of model size.
+        """
+        with open(os.path.join(directory, META_NAME)) as file:
+            meta = json.load(file)
+        arrays = {
+            name: np.load(os.path.join(directory, f'{name}.npy'), mmap_mode=mmap_mode)
+            for name in ARRAY_NAMES
+        }
+        return cls(
+            version=version or meta.get('version'),
+            global_mean=meta['global_mean'],
+            rating_scale=meta['rating_scale'],
+            path=directory,
+            **arrays,
+        )
+
+    def save(self, directory, **extra_meta):
+        """
+        Writes the model into `directory` as one raw .npy file per array plus a small
+        JSON metadata file; nothing is pickled.
+        """
+        os.makedirs(directory, exist_ok=True)
+        for name in ARRAY_NAMES:
+            np.save(os.path.join(directory, f'{name}.npy'), np.ascontiguousarray(getattr(self, name)))
+        meta = {
+            'version': self.version,
+            'global_mean': self.global_mean,
+            'rating_scale': list(self.rating_scale),
+            'n_factors': self.n_factors,
+            'n_users': len(self.user_ids),
+            'n_items': len(self.item_ids),
+            **extra_meta,
+        }
+        with open(os.path.join(directory, META_NAME), 'w') as file:
+            json.dump(meta, file, indent=2)
+        self.path = directory
+
+    @property
+    def n_factors(self):
+        return self.qi.shape[1]
+
+    def user_position(self, user_id):
+        """
+        Returns the row of `user_id` in the user arrays, or None if the user was not in the trainset.
+        """
+        position = int(self.user_positions([user_id])[0])
+        return position if position >= 0 else None
+
+    def user_positions(self, user_ids):
+        """
+        Returns the rows of `user_ids` in the user arrays, with -1 for users the model does not know.
+        """
+        return _positions(self.user_ids, user_ids)
+
+    def item_positions(self, movie_ids):
+        """
+        Returns the rows of `movie_ids` in the item arrays, with -1 for movies the model does not know.
+        """
+        return _positions(self.item_ids, movie_ids)
+
+    def user_factors(self, user_id):
+        """
+        Returns the (latent vector, bias) of a user; unknown users get zeros like Surprise does.
+        """
+        position = self.user_position(user_id)
+        if position is None:
+            return np.zeros(self.n_factors, dtype=np.float32), 0.0
+        return self.pu[position], float(self.bu[position])
+
+    def score_all(self, user_vector, user_bias):
+        """
+        Unclipped estimates for every movie in the model for one user.
+        """
+        return self.global_mean + user_bias + self.bi + self.qi @ user_vector
+
+    def clip(self, estimates):
+        low, high = self.rating_scale
+        return np.clip(estimates, low, high)
+
+    def estimate(self, user_vector, user_bias, movie_ids):
+        """
+        Clipped estimates of `movie_ids` for explicit user factors, e.g. folded-in ones.
+        """
+        positions = self.item_positions(movie_ids)
+        known = positions >= 0
+        estimates = np.full(len(positions), self.global_mean + user_bias, dtype=np.float64)
+        estimates[known] += self.bi[positions[known]] + self.qi[positions[known]] @ user_vector
+        return self.clip(estimates)
+
+    def predict(self, user_id, movie_id):
+        """
+        Estimated rating of `movie_id` by `user_id`, matching `SVD.predict(...).est`.
+        """
+        user_vector, user_bias = self.user_factors(user_id)
+        estimate = self.global_mean + user_bias
+        position = self.item_positions([movie_id])[0]
+        if position >= 0:
+            estimate += float(self.bi[position]) + float(self.qi[position] @ user_vector)
+        return float(self.clip(estimate))
+
+    def predict_many(self, user_ids, movie_ids):
+        """
+        Estimated ratings for aligned arrays of user and movie ids in one vectorized pass.
+        """
+        user_positions = self.user_positions(user_ids)
+        item_positions = self.item_positions(movie_ids)
+        known_users = user_positions >= 0
+        known_items = item_positions >= 0
+        known_pairs = known_users & known_items
+
+        estimates = np.full(len(user_positions), self.global_mean, dtype=np.float64)
+        estimates[known_users] += self.bu[user_positions[known_users]]
+        estimates[known_items] += self.bi[item_positions[known_items]]
+        estimates[known_pairs] += np.einsum(
+            'ij,ij->i', self.pu[user_positions[known_pairs]], self.qi[item_positions[known_pairs]]
+        )
+        return self.clip(estimates)
+
+
+def _positions(sorted_ids, ids):
+    """
+    Binary-searches `ids` in `sorted_ids`, returning -1 where an id is missing.
+    """
+    ids = np.asarray(ids, dtype=np.int64)
+    if not len(sorted_ids):
+        return np.full(ids.shape, -1, dtype=np.intp)
+    positions = np.minimum(np.searchsorted(sorted_ids, ids), len(sorted_ids) - 1)
+    return np.where(sorted_ids[positions] == ids, positions, -1)
+
+
+def fold_in(model, movie_ids, scores, reg=None):
+    """
+    Solves the latent vector and bias of a user from their ratings, keeping the item
+    factors, item biases and global mean of `model` frozen.
+
+    This is the ridge regression `[qi, 1] @ [pu, bu] ~ r - mu - bi` over the user's
+    rated movies, with the penalty scaled by the number of ratings as in SGD training.
+    It costs one (k+1) x (k+1) solve, so new raters get personal factors without a retrain.
+    Movies unknown to the model are ignored; with none left the user gets zero factors.
+    """
+    reg = settings.RECOMMENDATION_FOLD_IN_REG if reg is None else reg
+    positions = model.item_positions(movie_ids)
+    known = positions >= 0
+    if not known.any():
+        return np.zeros(model.n_factors, dtype=np.float32), 0.0
+
+    positions = positions[known]
+    targets = np.asarray(scores, dtype=np.float64)[known] - model.global_mean - model.bi[positions]
+    design = np.hstack([model.qi[positions].astype(np.float64), np.ones((len(positions), 1))])
+    gram = design.T @ design + reg * len(positions) * np.eye(design.shape[1])
+    solution = np.linalg.solve(gram, design.T @ targets)
+    return solution[:-1].astype(np.float32), float(solution[-1])
+
+
+def top_n_positions(scores, n):
+    """
+    Positions of the `n` highest finite scores in descending order.
+
+    Uses `np.argpartition` to select the candidates in linear time and only sorts those `n`.
+    Positions masked out with -inf are never returned.
+    """
+    n = min(n, int(np.isfinite(scores).sum()))
+    if n <= 0:
+        return np.empty(0, dtype=np.intp)
+    candidates = np.argpartition(-scores, n - 1)[:n]
+    return candidates[np.argsort(-scores[candidates], kind='stable')]
+
+
+def rank_items(model, user_vector, user_bias, exclude_movie_ids, n, retrieval='exact'):
+    """
+    Returns the `n` best (movie ids, estimates) for a user, skipping `exclude_movie_ids`.
+
+    With `retrieval='exact'` every movie in the model is scored. With `retrieval='ann'`
+    only candidates returned by the model's Annoy index are scored; if the model was
+    published without an index the exact scan is used instead.
+    """
+    excluded = model.item_positions(np.fromiter(exclude_movie_ids, dtype=np.int64))
+    excluded = excluded[excluded >= 0]
+
+    candidates = None
+    if retrieval == 'ann':
+        count = max(n * settings.RECOMMENDATION_ANN_OVERFETCH, n + len(excluded))
+        candidates = ann.candidate_positions(model, user_vector, count)
+
+    if candidates is None:
+        candidates = np.arange(len(model.item_ids))
+        scores = model.score_all(user_vector, user_bias)
+        scores[excluded] = -np.inf
+    else:
+        candidates = candidates[~np.isin(candidates, excluded)]
+        scores = model.global_mean + user_bias + model.bi[candidates] + model.qi[candidates] @ user_vector
+
+    top = top_n_positions(scores, n)
+    return model.item_ids[candidates[top]], model.clip(scores[top])
@@ -1,6 +1,7 @@
 from rest_framework import serializers
 from accounts.serializers import UserSerializer
 from movies.serializers import MovieSerializer 
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from movies.models import Movie 
 from .models import RecommendedMovie
@@ -24,4 +25,39 @@ class RecommendedMovieSerializer(serializers.ModelSerializer):
         movie_id = self.context['request'].data.get('movie_id')
         movie = Movie.objects.get(id=movie_id)
         recommended_movie, created = RecommendedMovie.objects.get_or_create(user=user, movie=movie)
-        return recommended_movie
\ No newline at end of file
+        return recommended_movie
+
+
+class RatingPairSerializer(serializers.Serializer):
+    user_id = serializers.IntegerField()
+    movie_id = serializers.IntegerField()
+
+
+class PredictRatingBatchSerializer(serializers.Serializer):
+    """
+    Accepts either a list of (user_id, movie_id) pairs or one user_id with many movie_ids,
+    and normalizes both forms to aligned `user_ids` and `movie_ids` lists.
+    """
+    pairs = RatingPairSerializer(many=True, required=False)
+    user_id = serializers.IntegerField(required=False)
+    movie_ids = serializers.ListField(child=serializers.IntegerField(), required=False)
+
+    def validate(self, attrs):
+        pairs = attrs.get('pairs')
+        if pairs is not None:
+            if 'user_id' in attrs or 'movie_ids' in attrs:
+                raise serializers.ValidationError("Provide either 'pairs' or 'user_id' with 'movie_ids', not both.")
+            user_ids = [pair['user_id'] for pair in pairs]
+            movie_ids = [pair['movie_id'] for pair in pairs]
+        elif 'user_id' in attrs and 'movie_ids' in attrs:
+            movie_ids = attrs['movie_ids']
+            user_ids = [attrs['user_id']] * len(movie_ids)
+        else:
+            raise serializers.ValidationError("Provide either 'pairs' or 'user_id' with 'movie_ids'.")
+
+        if not movie_ids:
+            raise serializers.ValidationError('At least one prediction must be requested.')
+        max_size = settings.RECOMMENDATION_MAX_BATCH_SIZE
+        if len(movie_ids) > max_size:
+            raise serializers.ValidationError(f'At most {max_size} predictions can be requested at once.')
+        return {'user_ids': user_ids, 'movie_ids': movie_ids}
@@ -0,0 +1,27 @@
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.dispatch import receiver
+from movies.models import Movie, Genre
+from .catalogue import invalidate_catalogue
+
+
+@receiver(post_save, sender=Movie)
+@receiver(post_delete, sender=Movie)
+@receiver(post_save, sender=Genre)
+@receiver(post_delete, sender=Genre)
+def invalidate_catalogue_on_change(sender, instance, update_fields=None, **kwargs):
+    """
+    Rebuild the in-memory catalogue when movies or genres are added, changed or deleted.
+    Average rating refreshes are left to the catalogue TTL, as they happen on every rating.
+    """
+    if update_fields is not None and set(update_fields) <= {'average_rating', 'rating_sum', 'rating_count'}:
+        return
+    invalidate_catalogue()
+
+
+@receiver(m2m_changed, sender=Movie.genres.through)
+def invalidate_catalogue_on_genres_change(sender, action, **kwargs):
+    """
+    Rebuild the in-memory catalogue when genre memberships change.
+    """
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        invalidate_catalogue()
@@ -0,0 +1,194 @@
+import asyncio
+import threading
+import time
+import uuid
+from concurrent.futures import Future
+
+from django.conf import settings
+from django.core.cache import cache
+
+# Seconds between checks for the leader's result in cross-process mode
+POLL_INTERVAL = 0.05
+
+
+class LeaderCancelled(Exception):
+    """
+    Set on a flight whose leader was cancelled; its waiters retry instead of failing.
+    """
+
+
+class SingleFlight:
+    """
+    In-process request coalescing.
+
+    The first caller for a key becomes the leader and runs the computation; callers
+    arriving with the same key while it runs wait for the leader and share its result
+    (or exception). Sync callers and coroutines on any thread share the same flights.
+    If the leader's task is cancelled, e.g. because its client disconnected, its waiters
+    start over and one of them becomes the new leader.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}  # key -> Future of the running computation
+
+    def _join(self, key):
+        """
+        Returns (future, is_leader) for `key`.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                return call, False
+            call = self._calls[key] = Future()
+            return call, True
+
+    def _finish(self, key, call, result=None, exception=None):
+        with self._lock:
+            self._calls.pop(key, None)
+        if exception is not None:
+            call.set_exception(exception)
+        else:
+            call.set_result(result)
+
+    def do(self, key, func):
+        """
+        Returns `func()`, sharing one call among concurrent callers with the same key.
+        """
+        call, leader = self._join(key)
+        while not leader:
+            try:
+                return call.result()
+            except LeaderCancelled:
+                call, leader = self._join(key)
+        try:
+            result = func()
+        except BaseException as e:
+            # Also on cancellation, so waiters are never left hanging
+            self._finish(key, call, exception=e)
+            raise
+        self._finish(key, call, result=result)
+        return result
+
+    async def ado(self, key, func):
+        """
+        Async version of `do`; `func` is a coroutine function.
+        """
+        call, leader = self._join(key)
+        while not leader:
+            try:
+                # Shielded, as cancelling a waiter would otherwise cancel the shared future
+                return await asyncio.shield(asyncio.wrap_future(call))
+            except LeaderCancelled:
+                call, leader = self._join(key)
+        try:
+            result = await func()
+        except asyncio.CancelledError:
+            self._finish(key, call, exception=LeaderCancelled())
+            raise
+        except BaseException as e:
+            # Also on cancellation, so waiters are never left hanging
+            self._finish(key, call, exception=e)
+            raise
+        self._finish(key, call, result=result)
+        return result
+
+
+class CacheSingleFlight:
+    """
+    Cross-process request coalescing through a lock in the shared cache.
+
+    The caller that adds the lock key runs the computation, which is expected to publish
+    its result where `lookup()` finds it (e.g. the cache). Other callers poll `lookup()`
+    until the result appears, take over if the lock is released without a result, and
+    compute it themselves after `wait_timeout` seconds. The lock expires after
+    `lock_timeout` seconds, so a crashed leader cannot block a key for long.
+    """
+
+    def __init__(self, lock_timeout=None, wait_timeout=None):
+        self._lock_timeout = lock_timeout
+        self._wait_timeout = wait_timeout
+
+    @property
+    def lock_timeout(self):
+        return self._lock_timeout or settings.RECOMMENDATION_SINGLE_FLIGHT_LOCK_TIMEOUT
+
+    @property
+    def wait_timeout(self):
+        return self._wait_timeout or settings.RECOMMENDATION_SINGLE_FLIGHT_WAIT
+
+    @staticmethod
+    def lock_key(key):
+        return f'singleflight_{key}'
+
+    def do(self, key, func, lookup):
+        """
+        Returns `func()` if this caller gets the lock, else the leader's result from `lookup()`.
+        """
+        lock_key, token = self.lock_key(key), uuid.uuid4().hex
+        deadline = time.monotonic() + self.wait_timeout
+        while True:
+            if cache.add(lock_key, token, timeout=self.lock_timeout):
+                try:
+                    return func()
+                finally:
+                    # Only release our own lock; it may have expired and been taken over
+                    if cache.get(lock_key) == token:
+                        cache.delete(lock_key)
+            time.sleep(POLL_INTERVAL)
+            result = lookup()
+            if result is not None:
+                return result
+            if time.monotonic() >= deadline:
+                return func()
+
+    async def ado(self, key, func, lookup):
+        """
+        Async version of `do`; `func` and `lookup` are coroutine functions.
+        """
+        lock_key, token = self.lock_key(key), uuid.uuid4().hex
+        deadline = time.monotonic() + self.wait_timeout
+        while True:
+            if await cache.aadd(lock_key, token, timeout=self.lock_timeout):
+                try:
+                    return await func()
+                finally:
+                    if await cache.aget(lock_key) == token:
+                        await cache.adelete(lock_key)
+            await asyncio.sleep(POLL_INTERVAL)
+            result = await lookup()
+            if result is not None:
+                return result
+            if time.monotonic() >= deadline:
+                return await func()
+
+
+local_flight = SingleFlight()
+cache_flight = CacheSingleFlight()
+
+
+def coalesce(key, func, lookup):
+    """
+    Runs `func()` once for concurrent callers with the same key, according to
+    RECOMMENDATION_SINGLE_FLIGHT: 'local' coalesces within the process, 'cache' also
+    across processes (one caller per process takes part in the cache lock), and 'off'
+    always calls `func`. `lookup()` returns the published result or None.
+    """
+    mode = settings.RECOMMENDATION_SINGLE_FLIGHT
+    if mode == 'cache':
+        return local_flight.do(key, lambda: cache_flight.do(key, func, lookup))
+    if mode == 'local':
+        return local_flight.do(key, func)
+    return func()
+
+
+async def acoalesce(key, func, lookup):
+    """
+    Async version of `coalesce`; `func` and `lookup` are coroutine functions.
+    """
+    mode = settings.RECOMMENDATION_SINGLE_FLIGHT
+    if mode == 'cache':
+        return await local_flight.ado(key, lambda: cache_flight.ado(key, func, lookup))
+    if mode == 'local':
+        return await local_flight.ado(key, func)
+    return await func()
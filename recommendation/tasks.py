@@ -0,0 +1,26 @@
+from celery import shared_task
+import logging
+
+from .cache import refresh_recommendations
+from .content import build_content_neighbours
+
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def refresh_user_recommendations(user_id, n=10):
+    """
+    Recomputes and caches the recommendations of a user after their ratings changed.
+    """
+    entry = refresh_recommendations(user_id, n=n)
+    return f"Cached {len(entry['items'])} recommendations for user {user_id} (model version {entry['version']})."
+
+
+@shared_task
+def build_content_neighbours_task():
+    """
+    Rebuilds the content similarity neighbours, e.g. after a catalogue import.
+    """
+    table = build_content_neighbours()
+    return f"Stored content neighbours for {len(table.movie_ids)} movies."
@@ -1,3 +1,233 @@
-from django.test import TestCase
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
 
-# Create your tests here.
+from django.core import signing
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from .cache import get_recommendation_list, invalidate_user_recommendations, recommendation_list_key
+from .pagination import CURSOR_SALT, ExpiredCursor, InvalidCursor, recommendation_page
+from .singleflight import CacheSingleFlight, SingleFlight
+
+USER_ID = 1
+
+
+@override_settings(RECOMMENDATION_LIST_DEPTH=25, RECOMMENDATION_RECOMPUTE_ON_RATING=False)
+class RecommendationPaginationTests(TestCase):
+    """
+    Cursor pagination over cached list snapshots. Ranking is replaced by a fake that
+    returns a different list on every computation, so the tests can tell lists apart.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.computations = 0
+        patches = [
+            mock.patch('recommendation.cache.current_model_version', return_value='v1'),
+            mock.patch('recommendation.cache.recommend_hybrid', side_effect=self.rank),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def rank(self, user_id, n):
+        self.computations += 1
+        return [(self.computations * 1000 + position, 5.0) for position in range(n)]
+
+    def page_through(self, cursor, page_size=10):
+        movie_ids = []
+        while cursor is not None:
+            _, items, cursor = recommendation_page(USER_ID, cursor, page_size)
+            movie_ids += [movie_id for movie_id, _ in items]
+        return movie_ids
+
+    def invalidate(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            invalidate_user_recommendations(USER_ID)
+
+    def test_pages_until_the_last_page(self):
+        version, items, cursor = recommendation_page(USER_ID, page_size=10)
+        self.assertEqual(version, 'v1')
+        _, second, cursor = recommendation_page(USER_ID, cursor, 10)
+        _, last, cursor = recommendation_page(USER_ID, cursor, 10)
+        self.assertEqual(len(items + second + last), 25)
+        self.assertEqual(len(last), 5)
+        self.assertIsNone(cursor)
+        self.assertEqual(self.computations, 1)
+
+    def test_cursor_keeps_its_list_after_invalidation(self):
+        _, first, cursor = recommendation_page(USER_ID, page_size=10)
+        self.invalidate()
+        rest = self.page_through(cursor)
+        self.assertEqual([movie_id for movie_id, _ in first] + rest, list(range(1000, 1025)))
+
+        # New first pages come from a recomputed list
+        _, items, _ = recommendation_page(USER_ID, page_size=10)
+        self.assertEqual(items[0][0], 2000)
+
+    def test_cursor_after_snapshot_expiry_uses_the_current_list(self):
+        _, _, cursor = recommendation_page(USER_ID, page_size=10)
+        entry = get_recommendation_list(USER_ID)
+        cache.delete(recommendation_list_key(entry['list_id']))
+        self.assertEqual(self.page_through(cursor), list(range(1010, 1025)))
+
+    def test_cursor_after_snapshot_expiry_and_invalidation_is_expired(self):
+        _, _, cursor = recommendation_page(USER_ID, page_size=10)
+        entry = get_recommendation_list(USER_ID)
+        self.invalidate()
+        cache.delete(recommendation_list_key(entry['list_id']))
+        with self.assertRaises(ExpiredCursor):
+            recommendation_page(USER_ID, cursor, 10)
+
+    def test_tampered_cursor_is_rejected(self):
+        _, _, cursor = recommendation_page(USER_ID, page_size=10)
+        with self.assertRaises(InvalidCursor):
+            recommendation_page(USER_ID, cursor[:-2] + ('A' if cursor[-2] != 'A' else 'B') + cursor[-1], 10)
+
+    def test_cursor_of_another_user_is_rejected(self):
+        payload = signing.loads(recommendation_page(USER_ID, page_size=10)[2], salt=CURSOR_SALT)
+        with self.assertRaises(InvalidCursor):
+            recommendation_page(USER_ID + 1, signing.dumps(payload, salt=CURSOR_SALT), 10)
+
+    def test_stale_computation_is_not_cached(self):
+        # A rating commits while the list is being computed from the old ratings
+        def rank_during_write(user_id, n):
+            self.invalidate()
+            return self.rank(user_id, n)
+
+        with mock.patch('recommendation.cache.recommend_hybrid', side_effect=rank_during_write):
+            get_recommendation_list(USER_ID)
+        get_recommendation_list(USER_ID)
+        self.assertEqual(self.computations, 2)
+
+
+class SingleFlightTests(SimpleTestCase):
+
+    def setUp(self):
+        self.flight = SingleFlight()
+        self.calls = 0
+
+    def blocking(self, release, result='result'):
+        """
+        Returns a function that counts its calls and blocks until `release` is set.
+        """
+        def func():
+            self.calls += 1
+            release.wait(5)
+            if isinstance(result, Exception):
+                raise result
+            return result
+        return func
+
+    def run_concurrently(self, func, callers=4):
+        release = threading.Event()
+        with ThreadPoolExecutor(callers) as pool:
+            futures = [pool.submit(self.flight.do, 'key', self.blocking(release, func)) for _ in range(callers)]
+            # Let every caller join the flight before the leader finishes
+            threading.Event().wait(0.1)
+            release.set()
+        return futures
+
+    def test_concurrent_callers_share_one_call(self):
+        futures = self.run_concurrently('result')
+        self.assertEqual([future.result() for future in futures], ['result'] * 4)
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(self.flight._calls, {})
+
+    def test_leader_exception_reaches_waiters(self):
+        futures = self.run_concurrently(ValueError('failed'))
+        for future in futures:
+            with self.assertRaisesMessage(ValueError, 'failed'):
+                future.result()
+        self.assertEqual(self.calls, 1)
+
+    def test_async_callers_share_one_call(self):
+        async def compute():
+            self.calls += 1
+            await asyncio.sleep(0.05)
+            return 'result'
+
+        async def main():
+            return await asyncio.gather(*(self.flight.ado('key', compute) for _ in range(4)))
+
+        self.assertEqual(asyncio.run(main()), ['result'] * 4)
+        self.assertEqual(self.calls, 1)
+
+    def test_async_leader_exception_reaches_waiters(self):
+        async def compute():
+            self.calls += 1
+            await asyncio.sleep(0.05)
+            raise ValueError('failed')
+
+        async def main():
+            return await asyncio.gather(*(self.flight.ado('key', compute) for _ in range(3)), return_exceptions=True)
+
+        results = asyncio.run(main())
+        self.assertEqual([type(result) for result in results], [ValueError] * 3)
+        self.assertEqual(self.calls, 1)
+
+    def test_waiters_retry_when_the_leader_is_cancelled(self):
+        async def compute():
+            self.calls += 1
+            await asyncio.sleep(0.05)
+            return self.calls
+
+        async def main():
+            leader = asyncio.create_task(self.flight.ado('key', compute))
+            await asyncio.sleep(0.01)
+            waiters = [asyncio.create_task(self.flight.ado('key', compute)) for _ in range(2)]
+            await asyncio.sleep(0.01)
+            leader.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await leader
+            return await asyncio.gather(*waiters)
+
+        # One of the waiters became the new leader and shared its result
+        self.assertEqual(asyncio.run(main()), [2, 2])
+        self.assertEqual(self.calls, 2)
+
+    def test_cancelled_waiter_does_not_cancel_the_flight(self):
+        async def compute():
+            self.calls += 1
+            await asyncio.sleep(0.05)
+            return 'result'
+
+        async def main():
+            leader = asyncio.create_task(self.flight.ado('key', compute))
+            await asyncio.sleep(0.01)
+            waiter = asyncio.create_task(self.flight.ado('key', compute))
+            await asyncio.sleep(0.01)
+            waiter.cancel()
+            return await leader
+
+        self.assertEqual(asyncio.run(main()), 'result')
+
+
+@override_settings(RECOMMENDATION_SINGLE_FLIGHT_WAIT=5)
+class CacheSingleFlightTests(SimpleTestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.calls = 0
+
+    def test_callers_in_other_processes_wait_for_the_published_result(self):
+        release = threading.Event()
+
+        def compute():
+            self.calls += 1
+            release.wait(5)
+            cache.set('published', 'result')
+            return 'result'
+
+        # Separate instances stand in for separate processes sharing the cache
+        with ThreadPoolExecutor(3) as pool:
+            futures = [
+                pool.submit(CacheSingleFlight().do, 'key', compute, lambda: cache.get('published'))
+                for _ in range(3)
+            ]
+            threading.Event().wait(0.1)
+            release.set()
+        self.assertEqual([future.result() for future in futures], ['result'] * 3)
+        self.assertEqual(self.calls, 1)
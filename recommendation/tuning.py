@@ -0,0 +1,174 @@
+import itertools
+import json
+import logging
+import multiprocessing
+import os
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+from django.conf import settings
+from django.db import connections
+from django.utils import timezone
+from surprise import SVD
+
+from .dataset import RatingArrays, build_trainset
+from .registry import atomic_write
+from .scoring import FactorModel
+
+logger = logging.getLogger(__name__)
+
+BEST_PARAMS_NAME = 'best_params.json'
+
+# Search space of the tuning notebook
+DEFAULT_PARAM_GRID = {
+    'n_epochs': [5, 10, 20],
+    'lr_all': [0.002, 0.005, 0.01],
+    'reg_all': [0.02, 0.1, 0.2],
+}
+
+# Rating arrays attached from shared memory in each pool worker
+_shared = {}
+
+
+def best_params_path():
+    return os.path.join(str(settings.RECOMMENDATION_MODEL_DIR), BEST_PARAMS_NAME)
+
+
+def load_best_params():
+    """
+    Returns the SVD parameters chosen by the last tuning run, or None if there was none.
+    """
+    try:
+        with open(best_params_path()) as file:
+            return json.load(file)['params']
+    except FileNotFoundError:
+        return None
+
+
+def candidate_params(param_grid, n_iter=None, seed=0):
+    """
+    Lists the parameter combinations to evaluate: the full grid, or `n_iter` of its
+    combinations drawn without replacement for a random search.
+    """
+    names = sorted(param_grid)
+    candidates = [dict(zip(names, values)) for values in itertools.product(*(param_grid[name] for name in names))]
+    if n_iter is not None and n_iter < len(candidates):
+        rng = np.random.default_rng(seed)
+        candidates = [candidates[index] for index in sorted(rng.choice(len(candidates), size=n_iter, replace=False))]
+    return candidates
+
+
+def assign_folds(n_ratings, cv, seed=0):
+    """
+    Randomly assigns each rating to one of `cv` folds of (nearly) equal size.
+    """
+    rng = np.random.default_rng(seed)
+    return (rng.permutation(n_ratings) % cv).astype(np.int8)
+
+
+def _share(arrays):
+    """
+    Copies named arrays into shared memory blocks. Returns the blocks and the
+    (name, block name, dtype, shape) specs workers need to attach to them.
+    """
+    blocks, specs = [], []
+    for name, array in arrays.items():
+        block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+        np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[:] = array
+        blocks.append(block)
+        specs.append((name, block.name, array.dtype.str, array.shape))
+    return blocks, specs
+
+
+def _attach(specs, seed):
+    """
+    Pool initializer: maps the shared rating arrays into the worker without copying them.
+    """
+    for name, block_name, dtype, shape in specs:
+        # The parent owns the blocks and unlinks them once the search is done
+        try:
+            block = shared_memory.SharedMemory(name=block_name, track=False)
+        except TypeError:
+            # Python < 3.13 registers every attach with the resource tracker, which would
+            # unlink the parent's blocks when the worker exits
+            block = shared_memory.SharedMemory(name=block_name)
+            resource_tracker.unregister(block._name, 'shared_memory')
+        _shared[name] = np.ndarray(shape, dtype=np.dtype(dtype), buffer=block.buf)
+        _shared[f'_{name}_block'] = block
+    _shared['seed'] = seed
+
+
+def _evaluate_fold(task):
+    """
+    Trains SVD with one parameter combination on all folds but one and scores the held-out fold.
+    """
+    candidate, params, fold = task
+    held_out = _shared['folds'] == fold
+    train = RatingArrays(*(_shared[name][~held_out] for name in ('users', 'items', 'scores')))
+    test = RatingArrays(*(_shared[name][held_out] for name in ('users', 'items', 'scores')))
+
+    algo = SVD(**params, random_state=_shared['seed'])
+    algo.fit(build_trainset(train, rating_scale=(1, 10)))
+    errors = FactorModel.from_surprise(algo).predict_many(test.users, test.items) - test.scores
+    return candidate, fold, float(np.sqrt(np.mean(errors ** 2))), float(np.mean(np.abs(errors)))
+
+
+def tune(ratings, param_grid=None, cv=3, n_iter=None, workers=None, seed=0):
+    """
+    Cross-validates SVD parameter combinations on `ratings` (`RatingArrays`) in parallel.
+
+    Every (combination, fold) pair is an independent task on a process pool with
+    `workers` processes (all cores by default). The rating arrays and fold assignment
+    are placed in shared memory once and mapped by each worker at start-up, so tasks
+    only carry their parameters. Returns the results sorted by mean RMSE, best first.
+    """
+    candidates = candidate_params(param_grid or DEFAULT_PARAM_GRID, n_iter=n_iter, seed=seed)
+    folds = assign_folds(len(ratings.scores), cv, seed=seed)
+    tasks = [(candidate, params, fold) for candidate, params in enumerate(candidates) for fold in range(cv)]
+    workers = workers or os.cpu_count() or 1
+
+    blocks, specs = _share({'users': ratings.users, 'items': ratings.items, 'scores': ratings.scores, 'folds': folds})
+    # Workers are forked from this process where possible and must not inherit open connections
+    connections.close_all()
+    start_method = 'fork' if 'fork' in multiprocessing.get_all_start_methods() else None
+    scores = {}
+    try:
+        with multiprocessing.get_context(start_method).Pool(workers, initializer=_attach, initargs=(specs, seed)) as pool:
+            for done, (candidate, fold, rmse, mae) in enumerate(pool.imap_unordered(_evaluate_fold, tasks), start=1):
+                scores.setdefault(candidate, []).append((rmse, mae))
+                logger.info('Finished %s/%s folds (candidate %s, fold %s, RMSE %.4f)', done, len(tasks), candidate, fold, rmse)
+    finally:
+        for block in blocks:
+            block.close()
+            block.unlink()
+
+    results = [
+        {
+            'params': params,
+            'rmse': float(np.mean([rmse for rmse, _ in scores[candidate]])),
+            'rmse_std': float(np.std([rmse for rmse, _ in scores[candidate]])),
+            'mae': float(np.mean([mae for _, mae in scores[candidate]])),
+        }
+        for candidate, params in enumerate(candidates)
+    ]
+    return sorted(results, key=lambda result: result['rmse'])
+
+
+def save_best_params(results, **meta):
+    """
+    Writes the best combination of a tuning run next to the published models, where
+    `train_model` picks it up. Returns the path of the file.
+    """
+    path = best_params_path()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    best = results[0]
+    document = {
+        'params': best['params'],
+        'rmse': best['rmse'],
+        'mae': best['mae'],
+        'tuned_at': timezone.now().isoformat(),
+        **meta,
+        'results': results,
+    }
+    atomic_write(path, json.dumps(document, indent=2).encode())
+    return path
@@ -1,8 +1,19 @@
 from django.urls import path
-from .views import predict_rating_view, recommend_movies_view
+from .views import (
+    predict_rating_view, predict_ratings_batch_view, recommend_movies_view, similar_movies_view, more_like_this_view,
+    predict_rating_async_view, recommend_movies_async_view,
+)
 
 urlpatterns = [
     path('predict-rating/', predict_rating_view, name='predict_rating'),
+    path('predict-rating/batch/', predict_ratings_batch_view, name='predict_ratings_batch'),
     
     path('recommend-movies/',  recommend_movies_view, name='recommend_movie'),
+
+    # Async variants for ASGI deployments
+    path('async/predict-rating/', predict_rating_async_view, name='predict_rating_async'),
+    path('async/recommend-movies/', recommend_movies_async_view, name='recommend_movie_async'),
+
+    path('movies/<int:movie_id>/similar/', similar_movies_view, name='similar_movies'),
+    path('movies/<int:movie_id>/more-like-this/', more_like_this_view, name='more_like_this'),
 ]
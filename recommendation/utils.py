@@ -1,153 +1,183 @@
-import os
-import pandas as pd
+import logging
+
+import numpy as np
 from django.conf import settings
-import pickle
-from django.db.models import Count, Q
+from django.utils import timezone
 from movies.models import Movie
 from django.db import models
-from django.core.files.storage import default_storage
-from django.core.files.base import ContentFile
 from ratings.models import Rating
-from surprise import SVD, Dataset, Reader
+from surprise import SVD
 from surprise.model_selection import train_test_split
 from django.contrib.auth import get_user_model
 import json
+from .registry import registry
+from .distribution import publish_to_storage
+from .ann import build_candidate_index
+from .item_neighbours import build_item_neighbours
+from .catalogue import catalogue
+from .content import build_content_neighbours, content_neighbours_path
+from .dataset import build_trainset, load_rating_arrays
+from .scoring import FactorModel, fold_in, rank_items
+from .tuning import load_best_params
 User = get_user_model()
+logger = logging.getLogger(__name__)
 
+# SVD hyperparameters used for training until `tune_model` has written tuned ones
+SVD_PARAMS = {'n_epochs': 20, 'lr_all': 0.01, 'reg_all': 0.2}
 
 
-def get_ratings_dataset():
-    """
-    Fetches ratings data from the database and returns a Surprise dataset object ready for training.
-    """
-    # Query the database for ratings
-    ratings_query = Rating.objects.all().values_list('user_id', 'movie_id', 'score')
-
-    # Create a DataFrame
-    ratings_df = pd.DataFrame(list(ratings_query), columns=['user', 'item', 'rating'])
-
-    # Define the reader with the rating scale
-    reader = Reader(rating_scale=(0.0, 10.0))  # Adjust the scale if your ratings range differently
-
-    # Load the dataset from the DataFrame
-    data = Dataset.load_from_df(ratings_df, reader)
-    
-    return data
-
 
 def train_model():
-    # Load the ratings dataset
-    data = get_ratings_dataset()
-    
+    # Stream the ratings into typed arrays and build the trainset from them directly
+    ratings = load_rating_arrays()
+    trainset = build_trainset(ratings, rating_scale=(1, 10))
+    del ratings
     
-    # Load the data into Surprise's format
-    reader = Reader(rating_scale=(1, 10))
-    dataset = Dataset.load_from_df(data.df[['user', 'item', 'rating']], reader)
-    trainset = dataset.build_full_trainset()
     
-    
-    # Train the SVD algorithm with optimized parameters
-    algo = SVD(n_epochs=20, lr_all=0.01, reg_all=0.2)
+    # Train the SVD algorithm with the parameters of the last tuning run, or the defaults
+    params = load_best_params() or dict(SVD_PARAMS)
+    algo = SVD(**params)
     algo.fit(trainset)
     
     
-     # Save the trained model to a file
-    file_path = r'C:\Users\Melarc.py\Documents\GitHub\Backend\FlixFinder\recommendation\models\trained_model.pkl'
-    with open(file_path, 'wb') as file:
-        pickle.dump(algo, file)
+    # Export the learned factors and stage them as a new version with the candidate index
+    # and the item-factor neighbours next to them
+    model = FactorModel.from_surprise(algo)
+    version = registry.stage(model, params=params, n_ratings=trainset.n_ratings, trained_at=timezone.now().isoformat())
+    build_candidate_index(model, registry.version_dir(version))
+    build_item_neighbours(model, registry.version_dir(version))
+
+    # Activate the version; serving workers pick it up on their next check
+    registry.activate(version)
+
+    # Rebuild the content neighbours, so movies added since the last run get neighbours
+    build_content_neighbours()
         
-    # Also save the trained model to Django's storage
-    django_path = 'recommendation/models/trained_model.pkl'
-    model_data = pickle.dumps(algo)
-    if default_storage.exists(django_path):
-        default_storage.delete(django_path)
-    default_storage.save(django_path, ContentFile(model_data))
+    # Publish the version and the content neighbours to Django's storage, from where
+    # `sync_model --watch` installs them on the serving nodes
+    publish_to_storage(version, registry.version_dir(version), shared=[content_neighbours_path()])
     
-    print("Model trained and saved successfully both locally and in Django storage!")
+    logger.info('Model version %s trained and saved both locally and in Django storage', version)
+    return version
 
 
 def load_model():
     """
-    Loads the trained SVD model from a file.
+    Returns the active trained model as a `FactorModel`.
+
+    The model is loaded once per process by the registry and hot-swapped when a new
+    version is published, so calling this on every request is cheap.
     """
-    # Define the path to the model file
-    file_path = r'C:\Users\Melarc.py\Documents\GitHub\Backend\FlixFinder\recommendation\models\trained_model.pkl'
-    #file_path = 'recommendation/models/trained_model.pkl' For production
-    
-    # Load the model from the file
-    with open(file_path, 'rb') as file:
-        model = pickle.load(file)
-    
-    print("Model loaded successfully!")
-    return model
+    return registry.get()
+
+
+def get_user_factors(model, user_id, ratings=None):
+    """
+    Returns the (latent vector, bias) of a user for `model`.
+
+    Users the model was trained with use their learned factors. Anyone else is folded
+    in from their current ratings (`ratings` is a list of (movie_id, score) pairs and
+    is read from the database if omitted), so users who started rating after the last
+    retrain still get personal recommendations.
+    """
+    if model.user_position(user_id) is not None:
+        return model.user_factors(user_id)
+    if ratings is None:
+        ratings = list(Rating.objects.filter(user_id=user_id).values_list('movie_id', 'score'))
+    if not ratings:
+        return model.user_factors(user_id)
+    movie_ids, scores = zip(*ratings)
+    return fold_in(model, movie_ids, np.asarray(scores, dtype=np.float64))
 
 
 def predict_rating(user_id, movie_id):
     # Load the trained SVD model
-    algo = load_model()
+    model = load_model()
 
     # Predict the rating that the user might give to the movie
-    prediction = algo.predict(uid=str(user_id), iid=str(movie_id))
-    return prediction.est
+    user_vector, user_bias = get_user_factors(model, int(user_id))
+    return float(model.estimate(user_vector, user_bias, [int(movie_id)])[0])
+
+
+def predict_ratings(user_ids, movie_ids):
+    """
+    Predicts ratings for aligned lists of user and movie ids in one vectorized pass.
+    Users unknown to the model are folded in from their ratings, read with a single query.
+    Returns the model version used and the list of predicted ratings.
+    """
+    version, model = registry.active()
+    user_ids = np.asarray(user_ids, dtype=np.int64)
+    movie_ids = np.asarray(movie_ids, dtype=np.int64)
+    estimates = model.predict_many(user_ids, movie_ids)
+
+    new_users = np.unique(user_ids[model.user_positions(user_ids) < 0])
+    if len(new_users):
+        ratings = {}
+        for user_id, movie_id, score in Rating.objects.filter(user_id__in=new_users.tolist()).values_list('user_id', 'movie_id', 'score'):
+            ratings.setdefault(user_id, []).append((movie_id, score))
+        for user_id, user_ratings in ratings.items():
+            user_vector, user_bias = get_user_factors(model, user_id, ratings=user_ratings)
+            pairs = user_ids == user_id
+            estimates[pairs] = model.estimate(user_vector, user_bias, movie_ids[pairs])
+
+    return version, estimates.tolist()
 
 
 
 
-def get_top_n_recommendations(user_id, n=10):
+def get_top_n_recommendations(user_id, n=10, retrieval=None):
+    """
+    Returns the top `n` (movie, predicted rating) pairs for a user.
+
+    Every movie known to the model is scored with one matrix-vector product over the
+    item factors, movies the user already rated are masked out, and the top `n` are
+    picked with a partial selection instead of sorting the whole catalogue. With
+    `retrieval='ann'` only candidates from the Annoy index are scored.
+    """
     # Load the trained model
-    algo = load_model()
-    
-    # Get all movies
-    all_movies = Movie.objects.all().values_list('id', flat=True)
-    
-    # Get movies already rated by the user
-    rated_movies = Rating.objects.filter(user_id=user_id).values_list('movie_id', flat=True)
-    
-    # Predict ratings for all movies that the user hasn't rated yet
-    predictions = []
-    for movie_id in set(all_movies) - set(rated_movies):
-        predicted = algo.predict(user_id, movie_id)
-        predictions.append((movie_id, predicted.est))
-    
-    # Sort the predictions based on the estimated rating
-    predictions.sort(key=lambda x: x[1], reverse=True)
-    
-    # Return the top n predictions
-    top_n = predictions[:n]
-    return [(Movie.objects.get(id=movie_id), rating) for movie_id, rating in top_n]
+    model = load_model()
+
+    # The user's ratings are excluded from the results and fold in users the model has not seen
+    ratings = list(Rating.objects.filter(user_id=user_id).values_list('movie_id', 'score'))
+    user_vector, user_bias = get_user_factors(model, user_id, ratings=ratings)
 
+    movie_ids, ratings = rank_items(
+        model, user_vector, user_bias, [movie_id for movie_id, _ in ratings], n,
+        retrieval=retrieval or settings.RECOMMENDATION_RETRIEVAL,
+    )
+
+    # Fetch the recommended movies in a single query
+    movie_ids, ratings = movie_ids.tolist(), ratings.tolist()
+    movies = Movie.objects.in_bulk(movie_ids)
+    return [(movies[movie_id], rating) for movie_id, rating in zip(movie_ids, ratings) if movie_id in movies]
+
+
+
+def get_preferred_genres(user):
+    """
+    Returns the list of genre names in a user's preferences.
+    """
+    # Ensure that preferences are treated as a dictionary if stored as a string
+    preferences = user.preferences
+    if isinstance(preferences, str):
+        preferences = json.loads(preferences)
+    return (preferences or {}).get('genres', [])
 
 
 def recommend_based_on_genres(user_id, n=10):
     """
     Recommends movies based on the user's preferred genres.
-    - If the user has one or more preferred genres, recommend movies matching any of those genres.
+    - If the user has one preferred genre, recommend top-rated movies in that genre.
+    - If the user has several preferred genres, recommend top-rated movies matching at least two of them.
     - If the user has no preferred genres, recommend top-rated movies.
+
+    Movies are selected with the in-memory genre bitmask index of the catalogue, so only
+    the chosen movies are read from the database.
     """
     user = User.objects.get(id=user_id)
-    
-    # Ensure that preferences are treated as a dictionary if stored as a string
-    if isinstance(user.preferences, str):
-        user.preferences = json.loads(user.preferences)
+    preferred_genres = get_preferred_genres(user)
 
-    preferred_genres = user.preferences.get('genres', [])
-    
-    if not preferred_genres:
-        # If the user has no genre preferences, return top rated movies
-        top_movies = Movie.objects.order_by('-average_rating')[:n]
-        return [(movie, movie.average_rating) for movie in top_movies]
-
-     # Adjust the query to handle one or more genres appropriately
-    if len(preferred_genres) == 1:
-        # If only one genre is preferred, filter directly without annotation
-        genre_matched_movies = Movie.objects.filter(genres__name=preferred_genres[0])
-    else:
-        # For multiple genres, use the previous approach
-        genre_matched_movies = Movie.objects.filter(
-            genres__name__in=preferred_genres
-        ).annotate(
-            matched_genres=Count('genres', filter=Q(genres__name__in=preferred_genres))
-        ).filter(matched_genres__gte=2).distinct()
-
-    top_movies = genre_matched_movies.order_by('-average_rating')[:n]
-    return [(movie, movie.average_rating) for movie in top_movies]
\ No newline at end of file
+    movies = catalogue.get()
+    movie_ids = movies.movie_ids[movies.top_rated_matching(preferred_genres, n)].tolist()
+    top_movies = Movie.objects.in_bulk(movie_ids)
+    return [(top_movies[movie_id], top_movies[movie_id].average_rating) for movie_id in movie_ids if movie_id in top_movies]
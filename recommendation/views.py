@@ -1,16 +1,93 @@
+from asgiref.sync import sync_to_async
 from rest_framework import status
 from rest_framework.decorators import api_view
+from rest_framework.exceptions import APIException
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+from rest_framework.utils.encoders import JSONEncoder
+from django.conf import settings
+from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
 from rest_framework.response import Response
 from django.contrib.auth import get_user_model
 from movies.models import Movie
+from movies.cache import get_movie_cards
 from ratings.models import Rating
 from .models import RecommendedMovie
-from .serializers import RecommendedMovieSerializer
-from .utils import predict_rating, get_top_n_recommendations, recommend_based_on_genres
+from .serializers import RecommendedMovieSerializer, PredictRatingBatchSerializer
+from .registry import ModelNotAvailable, registry
+from .content import similar_movies
+from .item_neighbours import more_like_this
+from .executor import run_scoring
+from .pagination import ExpiredCursor, InvalidCursor, arecommendation_page, page_size_from, recommendation_page
+from .utils import get_user_factors, predict_rating, predict_ratings
 
 User = get_user_model()
 
+
+def render_scored_movies(scored_movies, score_field):
+    """
+    Renders (movie_id, score) pairs as movie summaries from the cached movie cards,
+    hydrating the whole list with one cache round trip.
+    """
+    scores = dict(scored_movies)
+    return [{
+        'movie_id': card['id'],
+        'title': card['title'],
+        'slug': card['slug'],
+        'overview': card['overview'],
+        'language': card['language'],
+        'release_date': card['release_date'],
+        'poster_url': card['poster_url'],
+        'trailer_url': card['trailer_url'],
+        'average_rating': float(card['average_rating']),
+        score_field: scores[card['id']]
+    } for card in get_movie_cards(movie_id for movie_id, _ in scored_movies)]
+
+
+def request_param(request, name, data=None):
+    """
+    Reads a parameter from the request body, falling back to the query string.
+    `data` is the parsed body for requests that are not DRF requests.
+    """
+    data = request.data if data is None else data
+    value = data.get(name) if hasattr(data, 'get') else None
+    return value if value is not None else request.GET.get(name)
+
+
+def async_response(data, status=200):
+    """
+    JSON response for the async views, encoded like DRF responses (decimals, dates, ...).
+    """
+    return JsonResponse(data, status=status, encoder=JSONEncoder, safe=False)
+
+
+def api_exception_response(exc):
+    """
+    Renders a DRF `APIException` raised in an async view the way DRF's exception handler does.
+    """
+    data = exc.detail if isinstance(exc.detail, (list, dict)) else {'detail': exc.detail}
+    return async_response(data, status=exc.status_code)
+
+
+def _authenticate(request):
+    drf_request = Request(
+        request,
+        parsers=[parser() for parser in api_settings.DEFAULT_PARSER_CLASSES],
+        authenticators=[auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES],
+    )
+    return drf_request.user, drf_request.data
+
+
+async def authenticate_async(request):
+    """
+    Runs the DRF authenticators and parses the request body off the event loop,
+    as both may block (token lookups, Firebase key fetches).
+    Returns (user, data); raises `APIException` like DRF views do.
+    """
+    return await sync_to_async(_authenticate)(request)
+
 @api_view(['POST'])
 @csrf_exempt
 def predict_rating_view(request):
@@ -35,7 +112,10 @@ def predict_rating_view(request):
         return Response({'error': 'Movie not found.'}, status=status.HTTP_404_NOT_FOUND)
 
     # Predict rating
-    predicted_rating = predict_rating(user_id, movie_id)
+    try:
+        predicted_rating = predict_rating(user_id, movie_id)
+    except ModelNotAvailable as e:
+        return Response({'error': str(e)}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
     
     # Optionally, save or process the prediction
     movie = Movie.objects.get(id=movie_id)
@@ -45,43 +125,240 @@ def predict_rating_view(request):
 
     return Response({
         'predicted_rating': predicted_rating,
+        'model_version': registry.version,
         'recommended_movie': serializer.data
     }, status=status.HTTP_200_OK)
 
 
+@api_view(['POST'])
+@csrf_exempt
+def predict_ratings_batch_view(request):
+    """
+    API endpoint that predicts ratings for many (user, movie) pairs in one request.
+
+    Accepts either {"pairs": [{"user_id": 1, "movie_id": 2}, ...]} or
+    {"user_id": 1, "movie_ids": [2, 3, ...]}.
+    """
+    serializer = PredictRatingBatchSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    user_ids = serializer.validated_data['user_ids']
+    movie_ids = serializer.validated_data['movie_ids']
+
+    # Check that every user and movie exists with one query each
+    missing_users = set(user_ids) - set(User.objects.filter(id__in=set(user_ids)).values_list('id', flat=True))
+    if missing_users:
+        return Response({'error': 'User not found.', 'user_ids': sorted(missing_users)}, status=status.HTTP_404_NOT_FOUND)
+
+    missing_movies = set(movie_ids) - set(Movie.objects.filter(id__in=set(movie_ids)).values_list('id', flat=True))
+    if missing_movies:
+        return Response({'error': 'Movie not found.', 'movie_ids': sorted(missing_movies)}, status=status.HTTP_404_NOT_FOUND)
+
+    # Predict all ratings in one pass
+    try:
+        version, predicted_ratings = predict_ratings(user_ids, movie_ids)
+    except ModelNotAvailable as e:
+        return Response({'error': str(e)}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+
+    # Record the recommendations like the single prediction endpoint does
+    RecommendedMovie.objects.bulk_create(
+        [RecommendedMovie(user_id=user_id, movie_id=movie_id) for user_id, movie_id in set(zip(user_ids, movie_ids))],
+        ignore_conflicts=True,
+    )
+
+    return Response({
+        'predictions': [{
+            'user_id': user_id,
+            'movie_id': movie_id,
+            'predicted_rating': rating,
+        } for user_id, movie_id, rating in zip(user_ids, movie_ids, predicted_ratings)],
+        'model_version': version,
+    }, status=status.HTTP_200_OK)
+
+
 @api_view(['POST'])
 @csrf_exempt
 def recommend_movies_view(request):
+    """
+    API endpoint that returns one page of the user's recommendations.
+
+    Pass the `next_cursor` of a response as `cursor` to get the following page;
+    `page_size` defaults to RECOMMENDATION_PAGE_SIZE.
+    """
     user_id = request.user.id
     if user_id:
+        try:
+            page_size = page_size_from(request_param(request, 'page_size'))
+        except ValueError:
+            return Response({'error': 'Invalid page_size provided.'}, status=400)
         try:
             user_id = int(user_id)
-            # Count how many movies the user has rated
-            rating_count = Rating.objects.filter(user_id=user_id).count()
-            
-            if rating_count > 5:  # Threshold for cold start (adjust as needed)
-                # Use collaborative filtering
-                recommendations = get_top_n_recommendations(user_id, n=10)
-            else:
-                # Use content-based filtering
-                recommendations = recommend_based_on_genres(user_id, n=10)
+            # Served from the per-user cache unless the user's ratings or the model changed
+            version, recommendations, next_cursor = recommendation_page(
+                user_id, cursor=request_param(request, 'cursor'), page_size=page_size
+            )
             
             data = {
-                'recommendations': [{
-                    'movie_id': movie.id,
-                    'title': movie.title,
-                    'slug': movie.slug,
-                    'overview': movie.overview,
-                    'language': movie.language,
-                    'release_date': movie.release_date,
-                    'poster_url': movie.poster_url,
-                    'trailer_url': movie.trailer_url,
-                    'average_rating': movie.average_rating,
-                    'predicted_rating': rating
-                } for movie, rating in recommendations]
+                'recommendations': render_scored_movies(recommendations, 'predicted_rating'),
+                'model_version': version,
+                'next_cursor': next_cursor,
             }
             return Response(data, status=200)
         except ValueError:
             return Response({'error': 'Invalid user_id provided.'}, status=400)
+        except InvalidCursor as e:
+            return Response({'error': str(e)}, status=400)
+        except ExpiredCursor as e:
+            return Response({'error': str(e)}, status=410)
+        except ModelNotAvailable as e:
+            return Response({'error': str(e)}, status=503)
     else:
         return Response({'error': 'User ID is required'}, status=400)
+
+
+@csrf_exempt
+@require_POST
+async def predict_rating_async_view(request):
+    """
+    Async version of `predict_rating_view` for ASGI servers.
+
+    Database access uses the async ORM and the estimate is computed on the scoring
+    thread pool, so the event loop keeps serving other requests meanwhile.
+    """
+    try:
+        _, data = await authenticate_async(request)
+    except APIException as e:
+        return api_exception_response(e)
+
+    try:
+        user_id = int(data.get('user_id'))
+        movie_id = int(data.get('movie_id'))
+    except (TypeError, ValueError):
+        return async_response({'error': 'Invalid user_id or movie_id provided.'}, status=status.HTTP_400_BAD_REQUEST)
+
+    if not await User.objects.filter(id=user_id).aexists():
+        return async_response({'error': 'User not found.'}, status=status.HTTP_404_NOT_FOUND)
+
+    if not await Movie.objects.filter(id=movie_id).aexists():
+        return async_response({'error': 'Movie not found.'}, status=status.HTTP_404_NOT_FOUND)
+
+    try:
+        version, model = await sync_to_async(registry.active)()
+    except ModelNotAvailable as e:
+        return async_response({'error': str(e)}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+
+    # Users the model does not know are folded in from their ratings
+    ratings = None
+    if model.user_position(user_id) is None:
+        ratings = [rating async for rating in Rating.objects.filter(user_id=user_id).values_list('movie_id', 'score')]
+
+    def estimate():
+        user_vector, user_bias = get_user_factors(model, user_id, ratings=ratings)
+        return float(model.estimate(user_vector, user_bias, [movie_id])[0])
+
+    predicted_rating = await run_scoring(estimate)
+
+    recommended_movie, _ = await RecommendedMovie.objects.select_related('user', 'movie').aget_or_create(
+        user_id=user_id, movie_id=movie_id
+    )
+    recommended_movie_data = await sync_to_async(lambda: RecommendedMovieSerializer(recommended_movie).data)()
+
+    return async_response({
+        'predicted_rating': predicted_rating,
+        'model_version': version,
+        'recommended_movie': recommended_movie_data,
+    }, status=status.HTTP_200_OK)
+
+
+@csrf_exempt
+@require_POST
+async def recommend_movies_async_view(request):
+    """
+    Async version of `recommend_movies_view` for ASGI servers.
+
+    Cache and database reads are awaited and ranking runs on the scoring thread pool.
+    """
+    try:
+        user, data = await authenticate_async(request)
+    except APIException as e:
+        return api_exception_response(e)
+
+    # Authenticators may hand back no user at all when no credentials were sent
+    user_id = getattr(user, 'id', None)
+    if not user_id:
+        return async_response({'error': 'User ID is required'}, status=400)
+
+    try:
+        page_size = page_size_from(request_param(request, 'page_size', data))
+    except ValueError:
+        return async_response({'error': 'Invalid page_size provided.'}, status=400)
+
+    try:
+        version, recommendations, next_cursor = await arecommendation_page(
+            user_id, cursor=request_param(request, 'cursor', data), page_size=page_size
+        )
+    except InvalidCursor as e:
+        return async_response({'error': str(e)}, status=400)
+    except ExpiredCursor as e:
+        return async_response({'error': str(e)}, status=410)
+    except ModelNotAvailable as e:
+        return async_response({'error': str(e)}, status=503)
+
+    return async_response({
+        'recommendations': await sync_to_async(render_scored_movies)(recommendations, 'predicted_rating'),
+        'model_version': version,
+        'next_cursor': next_cursor,
+    }, status=200)
+
+
+
+@api_view(['GET'])
+def similar_movies_view(request, movie_id):
+    """
+    API endpoint that lists the movies most similar in content (overview and genres) to a movie.
+    Served from the precomputed content neighbour table.
+    """
+    if not Movie.objects.filter(id=movie_id).exists():
+        return Response({'error': 'Movie not found.'}, status=status.HTTP_404_NOT_FOUND)
+
+    try:
+        limit = min(int(request.query_params.get('limit', 10)), settings.RECOMMENDATION_CONTENT_NEIGHBOURS)
+        if limit < 1:
+            raise ValueError(limit)
+    except ValueError:
+        return Response({'error': 'Invalid limit provided.'}, status=status.HTTP_400_BAD_REQUEST)
+
+    neighbours = similar_movies(movie_id, limit=limit)
+    return Response({
+        'movie_id': movie_id,
+        'similar_movies': render_scored_movies(neighbours, 'similarity'),
+    }, status=status.HTTP_200_OK)
+
+
+@api_view(['GET'])
+def more_like_this_view(request, movie_id):
+    """
+    API endpoint that lists the movies closest to a movie in the item-factor space of the
+    active SVD model, i.e. movies the same users rated alike. Served from the neighbour
+    table published with the model version.
+    """
+    if not Movie.objects.filter(id=movie_id).exists():
+        return Response({'error': 'Movie not found.'}, status=status.HTTP_404_NOT_FOUND)
+
+    try:
+        limit = min(int(request.query_params.get('limit', 10)), settings.RECOMMENDATION_ITEM_NEIGHBOURS)
+        if limit < 1:
+            raise ValueError(limit)
+    except ValueError:
+        return Response({'error': 'Invalid limit provided.'}, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        version, neighbours = more_like_this(movie_id, limit=limit)
+    except ModelNotAvailable as e:
+        return Response({'error': str(e)}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+
+    return Response({
+        'movie_id': movie_id,
+        'model_version': version,
+        'similar_movies': render_scored_movies(neighbours, 'similarity'),
+    }, status=status.HTTP_200_OK)